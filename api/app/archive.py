@@ -0,0 +1,192 @@
+"""Hot/cold tiering: old orders in a terminal status live in orders_archive.
+
+archive_orders moves orders older than ARCHIVE_AFTER_DAYS whose status is
+one of ARCHIVE_STATUSES into the archive, in batches of ARCHIVE_BATCH_SIZE
+with ARCHIVE_BATCH_PAUSE seconds between them, so it can run next to live
+traffic. Run it regularly, e.g. nightly from cron:
+
+    python -m app.archive
+
+Order lists read the archive too only when a date filter reaches back to
+it, see includes_archive. Archived orders stay in the daily rollups, so
+stats keep covering every order.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import (DateTime, delete, func, insert, literal, select,
+                        tuple_)
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+import logging
+import os
+import time
+
+from .change_tokens import ORDERS_TOKEN, bump_token
+from .models import ArchivedOrder, Order, OrderStatus
+
+logger = logging.getLogger(__name__)
+
+# Orders older than this many days are archived once they are finished
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+
+# Names of the terminal statuses, orders in other statuses stay live
+ARCHIVE_STATUSES = [
+    name.strip()
+    for name in os.getenv("ARCHIVE_STATUSES", "Vybavené,Stornované").split(",")
+    if name.strip()
+]
+
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+# Pause between batches, keeps replication lag and lock waits low
+ARCHIVE_BATCH_PAUSE = float(os.getenv("ARCHIVE_BATCH_PAUSE", "0.5"))
+
+ARCHIVE_COLUMNS = ("id", "vehicle_category_id", "brand", "price",
+                   "status_id", "created_at", "version")
+
+
+def archive_watermark(db: Session) -> Optional[datetime]:
+    """created_at of the newest archived order, None if the archive is
+    empty. Answered from the end of the created_at index."""
+    return db.execute(select(func.max(ArchivedOrder.created_at))).scalar()
+
+
+def includes_archive(filters: dict, watermark: Optional[datetime]) -> bool:
+    """Whether a list with these filters must read the archive as well.
+
+    Lists without a date filter show the live orders only. A date range
+    includes the archive once it starts at or before the newest archived
+    order, or has no start at all.
+    """
+    if watermark is None:
+        return False
+    if "date_from" not in filters and "date_to" not in filters:
+        return False
+    date_from = filters.get("date_from")
+    return date_from is None or date_from <= watermark
+
+
+def fetch_archived_order(db: Session, order_id: int) -> Optional[dict]:
+    row = db.execute(
+        select(*(getattr(ArchivedOrder, column) for column in ARCHIVE_COLUMNS))
+        .where(ArchivedOrder.id == order_id)
+    ).first()
+    return dict(row._mapping) if row is not None else None
+
+
+def archive_status_ids(db: Session,
+                       names: List[str] = ARCHIVE_STATUSES) -> List[int]:
+    return list(db.execute(
+        select(OrderStatus.id).where(OrderStatus.status.in_(names))
+    ).scalars())
+
+
+def archive_candidates(db: Session, status_id: int, cutoff: datetime,
+                       batch_size: int = ARCHIVE_BATCH_SIZE,
+                       after: Optional[Tuple[datetime, int]] = None
+                       ) -> List[Tuple[datetime, int]]:
+    """(created_at, id) of the next archivable orders in one status, after
+    the keyset `after`.
+
+    Walks ix_orders_status_created_at in (created_at, id) order and locks
+    nothing, archive_batch locks the chosen ids.
+    """
+    query = (
+        select(Order.created_at, Order.id)
+        .where(Order.status_id == status_id, Order.created_at < cutoff)
+        .order_by(Order.created_at, Order.id)
+        .limit(batch_size)
+    )
+    if after is not None:
+        row_key = tuple_(Order.created_at, Order.id)
+        query = query.where(Order.created_at >= after[0],
+                            row_key > tuple_(*after))
+    return [tuple(row) for row in db.execute(query)]
+
+
+def archive_batch(db: Session, ids: List[int], status_ids: List[int],
+                  cutoff: datetime) -> int:
+    """Move the orders with these ids that are still archivable, returns
+    how many were moved.
+
+    Only the chosen ids are locked, by primary key. Copy and delete happen
+    in one transaction, rows locked by a concurrent write are skipped and
+    picked up by a later run.
+    """
+    ids = list(db.execute(
+        select(Order.id)
+        .where(Order.id.in_(ids),
+               Order.status_id.in_(status_ids),
+               Order.created_at < cutoff)
+        .with_for_update(skip_locked=True)
+    ).scalars())
+    if not ids:
+        db.rollback()
+        return 0
+
+    columns = [getattr(Order, column) for column in ARCHIVE_COLUMNS]
+    db.execute(insert(ArchivedOrder).from_select(
+        [*ARCHIVE_COLUMNS, "archived_at"],
+        select(*columns, literal(datetime.utcnow(), DateTime))
+        .where(Order.id.in_(ids))
+    ))
+    db.execute(delete(Order).where(Order.id.in_(ids))
+               .execution_options(synchronize_session=False))
+    # The rollups count archived orders too, only the lists change
+    bump_token(db, ORDERS_TOKEN)
+    db.commit()
+    return len(ids)
+
+
+def archive_orders(db: Session, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                   batch_size: int = ARCHIVE_BATCH_SIZE,
+                   pause: float = ARCHIVE_BATCH_PAUSE,
+                   max_batches: Optional[int] = None) -> int:
+    """Archive everything that qualifies, batch by batch. Returns the
+    number of orders moved.
+
+    Each status is walked once in (created_at, id) order, the keyset is
+    carried from batch to batch so skipped rows are not read again.
+    """
+    status_ids = archive_status_ids(db)
+    if not status_ids:
+        logger.warning("None of the archive statuses exist: %s",
+                       ARCHIVE_STATUSES)
+        return 0
+    # created_at is stored in UTC, see the Order model
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    moved = 0
+    batches = 0
+    for status_id in status_ids:
+        after = None
+        while max_batches is None or batches < max_batches:
+            candidates = archive_candidates(db, status_id, cutoff,
+                                            batch_size, after)
+            if not candidates:
+                break
+            after = candidates[-1]
+            count = archive_batch(db, [order_id for _, order_id in candidates],
+                                  status_ids, cutoff)
+            moved += count
+            batches += 1
+            if count:
+                logger.info("Archived %d orders (%d in total)", count, moved)
+            if len(candidates) < batch_size:
+                break
+            time.sleep(pause)
+    return moved
+
+
+def main():
+    from .database import SessionLocal
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        moved = archive_orders(db)
+        print(f"Archived {moved} orders")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
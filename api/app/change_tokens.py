@@ -0,0 +1,37 @@
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional
+import uuid
+
+from .models import ChangeToken
+
+# Replaced by every write to the orders table
+ORDERS_TOKEN = "orders"
+
+
+def current_token(db: Session, name: str) -> Optional[str]:
+    """The current token, None if nothing was recorded yet."""
+    return db.execute(
+        select(ChangeToken.token).where(ChangeToken.name == name)
+    ).scalar()
+
+
+def bump_token(db: Session, name: str):
+    """Replace the token inside the caller's transaction.
+
+    Call it right before the commit, the row stays locked until then.
+    Random tokens never repeat, even if the table is emptied.
+    """
+    token = uuid.uuid4().hex
+    statement = (update(ChangeToken)
+                 .where(ChangeToken.name == name)
+                 .values(token=token)
+                 .execution_options(synchronize_session=False))
+    if db.execute(statement).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(ChangeToken).values(name=name, token=token))
+    except IntegrityError:
+        db.execute(statement)
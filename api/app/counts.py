@@ -0,0 +1,126 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+import logging
+import os
+import threading
+import time
+
+from .filters import apply_order_filters, filters_key
+from .models import ArchivedOrder, Order
+
+logger = logging.getLogger(__name__)
+
+TOTAL_MODE_EXACT = "exact"
+TOTAL_MODE_ESTIMATE = "estimate"
+TOTAL_MODE_NONE = "none"
+
+# Seconds an exact count stays valid for a given filter set
+COUNT_CACHE_TTL = float(os.getenv("ORDER_COUNT_CACHE_TTL", "5"))
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("ORDER_COUNT_CACHE_MAX_ENTRIES", "1024"))
+
+
+class CountCache:
+    """Thread-safe TTL cache of COUNT(*) results keyed by filter set.
+
+    Expired entries are kept around so the estimate mode can still serve
+    them; invalidate() drops everything after a write.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key, allow_stale: bool = False):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if not allow_stale and expires_at < time.monotonic():
+            return None
+        return value
+
+    def set(self, key, value: int, generation: int):
+        with self._lock:
+            # A write happened while counting, the value may already be stale
+            if generation != self._generation:
+                return
+            if key not in self._entries and len(
+                    self._entries) >= self.max_entries:
+                # Evict the entry closest to expiry
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                del self._entries[oldest]
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+order_counts = CountCache(COUNT_CACHE_TTL, COUNT_CACHE_MAX_ENTRIES)
+
+
+def _count_key(db: Session, filters: dict, include_archive: bool) -> tuple:
+    # Primary and replicas may disagree, count them separately
+    return db.get_bind().url, filters_key(filters), include_archive
+
+
+def exact_order_total(db: Session, filters: dict,
+                      include_archive: bool = False) -> int:
+    key = _count_key(db, filters, include_archive)
+    total = order_counts.get(key)
+    if total is not None:
+        return total
+
+    generation = order_counts.generation
+    models = (Order, ArchivedOrder) if include_archive else (Order,)
+    total = sum(apply_order_filters(db.query(model), filters, model).count()
+                for model in models)
+    order_counts.set(key, total, generation)
+    return total
+
+
+def _table_row_estimate(db: Session):
+    # InnoDB keeps an approximate row count in the table statistics
+    if db.bind.dialect.name != "mysql":
+        return None
+    return db.execute(
+        text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ),
+        {"table": Order.__tablename__}
+    ).scalar()
+
+
+def estimate_order_total(db: Session, filters: dict,
+                         include_archive: bool = False) -> int:
+    # Any previously counted value is good enough for an estimate
+    total = order_counts.get(_count_key(db, filters, include_archive),
+                             allow_stale=True)
+    if total is not None:
+        return total
+
+    if not filters:
+        total = _table_row_estimate(db)
+        if total is not None:
+            return int(total)
+
+    return exact_order_total(db, filters, include_archive)
+
+
+def order_total(db: Session, filters: dict, total_mode: str,
+                include_archive: bool = False):
+    if total_mode == TOTAL_MODE_NONE:
+        return None
+    if total_mode == TOTAL_MODE_ESTIMATE:
+        return estimate_order_total(db, filters, include_archive)
+    return exact_order_total(db, filters, include_archive)
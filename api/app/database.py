@@ -1,34 +1,151 @@
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from typing import Union
 import os
 import time
-from sqlalchemy.exc import OperationalError
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import DisconnectionError, OperationalError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from .metrics import instrument_engine, observe_checkout_wait
 
 # Get database URL from environment variable
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
-print(f"Using DATABASE_URL: {DATABASE_URL}")
+# Serve requests through the async engine instead of the threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
 
-# Configure engine with connection pooling
+# Async drivers matching the sync ones used in DATABASE_URL
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite"
+}
+
+
+def to_async_url(url: str) -> str:
+    scheme, separator, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(
+    DATABASE_URL)
+
+# Worker processes sharing DB_MAX_CONNECTIONS, uvicorn reads the same
+# variable for its default --workers
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+
+# "idle" pings connections that sat unused for DB_PRE_PING_IDLE seconds,
+# "always" pings on every checkout, "off" never
+PRE_PING_ALWAYS = "always"
+PRE_PING_IDLE = "idle"
+PRE_PING_OFF = "off"
+
+
+def pool_settings() -> dict:
+    """Pool configuration for one worker process, from the environment.
+
+    DB_POOL_SIZE/DB_MAX_OVERFLOW set the sizes directly. Otherwise, if
+    DB_MAX_CONNECTIONS is set, that server-side budget is split evenly
+    between the WEB_CONCURRENCY workers with no overflow, so all workers
+    together never open more than the budget.
+    """
+    pool_size = os.getenv("DB_POOL_SIZE")
+    max_overflow = os.getenv("DB_MAX_OVERFLOW")
+    max_connections = os.getenv("DB_MAX_CONNECTIONS")
+    if pool_size is None and max_connections is not None:
+        pool_size = max(int(max_connections) // WEB_CONCURRENCY, 1)
+        max_overflow = max_overflow or 0
+    return {
+        "pool_size": int(pool_size or 5),
+        "max_overflow": int(max_overflow if max_overflow is not None else 10),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pre_ping": os.getenv("DB_PRE_PING", PRE_PING_IDLE).lower(),
+        "pre_ping_idle": float(os.getenv("DB_PRE_PING_IDLE", "30")),
+        "echo": os.getenv("DB_ECHO", "false").lower() == "true"
+    }
+
+
+POOL_SETTINGS = pool_settings()
+
+
+def engine_options(settings: dict) -> dict:
+    return {
+        "pool_size": settings["pool_size"],
+        "max_overflow": settings["max_overflow"],
+        "pool_timeout": settings["pool_timeout"],
+        "pool_recycle": settings["pool_recycle"],
+        "pool_pre_ping": settings["pre_ping"] == PRE_PING_ALWAYS,
+        "echo": settings["echo"]
+    }
+
+
+def _record_checkin(dbapi_connection, connection_record):
+    connection_record.info["checked_in_at"] = time.monotonic()
+
+
+def _ping_if_idle(idle_seconds: float):
+    def ping(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or \
+                time.monotonic() - checked_in_at < idle_seconds:
+            return
+        # Recently used connections are trusted, so busy workers skip the
+        # round trip that pool_pre_ping costs on every checkout
+        try:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+        except Exception as e:
+            # The pool discards the connection and retries with a new one
+            raise DisconnectionError(str(e)) from e
+    return ping
+
+
+def configure_pool_events(engine, settings: dict = POOL_SETTINGS):
+    if settings["pre_ping"] == PRE_PING_IDLE:
+        event.listen(engine, "checkin", _record_checkin)
+        event.listen(engine, "checkout",
+                     _ping_if_idle(settings["pre_ping_idle"]))
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long checkouts wait for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            observe_checkout_wait(self, started)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            observe_checkout_wait(self, started)
+
+
+# Configure engine with connection pooling, see pool_settings()
 engine = create_engine(
     DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=5,  # Number of permanent connections
-    max_overflow=10,  # Number of additional connections when pool is full
-    pool_timeout=30,  # Seconds to wait for available connection
-    pool_recycle=1800,  # Recycle connections after 30 minutes
-    pool_pre_ping=True,  # Enable connection health checks
-    echo=False  # Set to True for SQL query logging
+    poolclass=InstrumentedQueuePool,
+    **engine_options(POOL_SETTINGS)
 )
 
 # Set UTF8MB4 for all connections
 
 
-@event.listens_for(engine, 'connect')
 def set_utf8mb4(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     try:
@@ -39,6 +156,11 @@ def set_utf8mb4(dbapi_connection, connection_record):
         cursor.close()
 
 
+event.listen(engine, 'connect', set_utf8mb4)
+configure_pool_events(engine)
+instrument_engine(engine)
+
+
 # Create session factory with proper configuration
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -47,15 +169,53 @@ SessionLocal = sessionmaker(
     expire_on_commit=False  # Prevent expired object issues
 )
 
+# Async engine and sessions, only created when enabled so the async
+# driver is not required otherwise
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        poolclass=InstrumentedAsyncQueuePool,
+        **engine_options(POOL_SETTINGS)
+    )
+    event.listen(async_engine.sync_engine, 'connect', set_utf8mb4)
+    configure_pool_events(async_engine.sync_engine)
+    instrument_engine(async_engine.sync_engine, "async")
+    AsyncSessionLocal = sessionmaker(
+        async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
 # Create base class for declarative models
 Base = declarative_base()
 
-# Dependency to get DB session
+# Dependency to get DB session, an AsyncSession when DB_ASYNC is set
 
+DbSession = Union[Session, AsyncSession]
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+if DB_ASYNC:
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+else:
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """Run fn(session, *args, **kwargs) without blocking the event loop.
+
+    Handlers keep their query code written against the sync Session API.
+    With an AsyncSession it runs through run_sync on the async driver,
+    otherwise it runs on the threadpool like a plain `def` handler would.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
@@ -0,0 +1,200 @@
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+import asyncio
+import logging
+import os
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Undelivered events kept per subscriber. A subscriber that falls this far
+# behind gets a "reset" event and is dropped, it has to refetch anyway.
+ORDER_EVENTS_QUEUE_SIZE = int(os.getenv("ORDER_EVENTS_QUEUE_SIZE", "100"))
+
+# Seconds between SSE comments on an idle stream, also how quickly a
+# closed connection is noticed
+ORDER_EVENTS_KEEPALIVE = float(os.getenv("ORDER_EVENTS_KEEPALIVE", "15"))
+
+EVENT_CREATED = "order.created"
+EVENT_UPDATED = "order.updated"
+EVENT_DELETED = "order.deleted"
+# Many orders changed at once (bulk import), clients should refetch
+EVENT_BULK = "orders.changed"
+EVENT_RESET = "reset"
+
+FilterKey = Tuple[Optional[int], Optional[int]]
+
+
+def format_sse(event_type: str, data: bytes) -> str:
+    return f"event: {event_type}\ndata: {data.decode('utf-8')}\n\n"
+
+
+def _filter_keys(event: dict) -> Optional[Set[FilterKey]]:
+    """Subscription keys interested in event, None for everybody."""
+    rows = [row for row in (event.get("order"), event.get("previous")) if row]
+    if not rows:
+        return None
+    keys = set()
+    for row in rows:
+        status_id = row.get("status_id")
+        category_id = row.get("vehicle_category_id")
+        keys.update({(None, None), (status_id, None), (None, category_id),
+                     (status_id, category_id)})
+    return keys
+
+
+def order_event(event_type: str, order: dict,
+                previous: Optional[dict] = None) -> dict:
+    """Event for one order.
+
+    previous holds the filter fields from before an update, so subscribers
+    also learn about orders that left their filter.
+    """
+    event = {"type": event_type, "id": order["id"], "order": order}
+    if previous is not None:
+        event["previous"] = {
+            "status_id": previous["status_id"],
+            "vehicle_category_id": previous["vehicle_category_id"]
+        }
+    return event
+
+
+class Broker(ABC):
+    """Carries events between workers.
+
+    publish() is called from request threads and must not block. A broker
+    hands every event, including the ones this worker published, to the
+    deliver callback given to start().
+    """
+
+    @abstractmethod
+    async def start(self, deliver: Callable[[dict], None]):
+        pass
+
+    @abstractmethod
+    def publish(self, event: dict):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class InMemoryBroker(Broker):
+    """Single-worker broker, events only reach this process."""
+
+    def __init__(self):
+        self._deliver = None
+
+    async def start(self, deliver: Callable[[dict], None]):
+        self._deliver = deliver
+
+    def publish(self, event: dict):
+        if self._deliver is not None:
+            self._deliver(event)
+
+    async def stop(self):
+        self._deliver = None
+
+
+class Subscription:
+    __slots__ = ("key", "queue")
+
+    def __init__(self, key: FilterKey, queue_size: int):
+        self.key = key
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    async def get(self) -> Tuple[str, bytes]:
+        return await self.queue.get()
+
+
+class EventBus:
+    """In-process fan-out of order events to SSE subscribers.
+
+    Subscribers are indexed by their (status, category) filter, so an event
+    is matched against at most eight index entries instead of every
+    subscriber. All queue operations happen on the event loop the bus was
+    started on, publish() may be called from any thread.
+    """
+
+    def __init__(self, broker: Optional[Broker] = None,
+                 queue_size: int = ORDER_EVENTS_QUEUE_SIZE):
+        self.broker = broker or InMemoryBroker()
+        self.queue_size = queue_size
+        self._subscribers: Dict[FilterKey, Set[Subscription]] = {}
+        self._loop = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await self.broker.start(self.deliver)
+
+    async def stop(self):
+        await self.broker.stop()
+        self._loop = None
+
+    def publish(self, event: dict):
+        try:
+            self.broker.publish(event)
+        except Exception:
+            # Losing a notification must not fail the write that caused it
+            logger.exception("Could not publish order event")
+
+    def deliver(self, event: dict):
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._fan_out, event)
+        except RuntimeError:
+            # Loop already closed during shutdown
+            pass
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers)
+                   for subscribers in self._subscribers.values())
+
+    def subscribe(self, status_id: Optional[int] = None,
+                  category_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription((status_id, category_id), self.queue_size)
+        self._subscribers.setdefault(subscription.key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.key)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.key]
+
+    def _matching(self, keys: Optional[Set[FilterKey]]) -> Iterable:
+        if keys is None:
+            return [subscription
+                    for subscribers in self._subscribers.values()
+                    for subscription in subscribers]
+        matched = set()
+        for key in keys:
+            matched.update(self._subscribers.get(key, ()))
+        return matched
+
+    def _fan_out(self, event: dict):
+        subscriptions = self._matching(_filter_keys(event))
+        if not subscriptions:
+            return
+        # Rendered once, shared by all subscribers
+        message = (event["type"], orjson.dumps(event))
+        for subscription in subscriptions:
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._reset(subscription)
+
+    def _reset(self, subscription: Subscription):
+        self.unsubscribe(subscription)
+        queue = subscription.queue
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait((EVENT_RESET, b"{}"))
+
+
+order_events = EventBus()
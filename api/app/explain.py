@@ -0,0 +1,87 @@
+from datetime import datetime
+from itertools import combinations
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from .filters import NEWEST_FIRST, apply_order_filters
+from .models import Order
+
+# Sample values for every filter get_orders understands. Search is left out
+# on purpose, a substring match cannot be served by a B-tree index.
+SAMPLE_FILTERS = {
+    "status_id": 1,
+    "category_id": 1,
+    "date_from": datetime(2024, 1, 1),
+    "date_to": datetime(2024, 12, 31, 23, 59, 59),
+    "price_from": 1000.0,
+    "price_to": 5000.0
+}
+
+
+class Explain(Executable, ClauseElement):
+    """Wraps a SELECT so it executes as EXPLAIN with the same parameters."""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    prefix = "EXPLAIN"
+    if compiler.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN"
+    return f"{prefix} {compiler.process(element.statement, **kw)}"
+
+
+def explain_query(db: Session, query) -> list:
+    statement = getattr(query, "statement", query)
+    result = db.execute(Explain(statement))
+    return [dict(row) for row in result.mappings()]
+
+
+def is_full_scan(plan: list) -> bool:
+    for row in plan:
+        # MySQL reports a full table scan as access type ALL
+        if row.get("type") == "ALL" and row.get("table") == Order.__tablename__:
+            return True
+        # SQLite prints "SCAN orders" without an index for full scans
+        detail = row.get("detail") or ""
+        if detail.startswith(("SCAN orders", "SCAN TABLE orders")) and \
+                "INDEX" not in detail:
+            return True
+    return False
+
+
+def order_page_query(db: Session, filters: dict, per_page: int = 20):
+    # Mirrors the page query get_orders runs for the first page
+    query = apply_order_filters(db.query(Order), filters)
+    return query.order_by(*NEWEST_FIRST).limit(per_page)
+
+
+def explain_order_filters(db: Session, filters: dict) -> dict:
+    page_plan = explain_query(db, order_page_query(db, filters))
+    count_plan = explain_query(
+        db, apply_order_filters(db.query(Order), filters).statement
+        .with_only_columns([Order.id]))
+    return {
+        "filters": sorted(filters),
+        "page": page_plan,
+        "count": count_plan,
+        "full_scan": is_full_scan(page_plan)
+    }
+
+
+def filter_combinations(max_size: int = 3):
+    names = sorted(SAMPLE_FILTERS)
+    yield {}
+    for size in range(1, max_size + 1):
+        for combo in combinations(names, size):
+            yield {name: SAMPLE_FILTERS[name] for name in combo}
+
+
+def explain_filter_combinations(db: Session, max_size: int = 3) -> list:
+    return [explain_order_filters(db, filters)
+            for filters in filter_combinations(max_size)]
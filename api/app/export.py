@@ -0,0 +1,95 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+import csv
+import io
+import json
+import os
+
+from .filters import NEWEST_FIRST, apply_order_filters
+from .models import Order
+
+# Rows fetched from the server-side cursor (and written) per chunk
+EXPORT_CHUNK_SIZE = int(os.getenv("ORDER_EXPORT_CHUNK_SIZE", "1000"))
+
+EXPORT_COLUMNS = (
+    Order.id,
+    Order.brand,
+    Order.price,
+    Order.vehicle_category_id,
+    Order.status_id,
+    Order.created_at
+)
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8"
+}
+
+
+def export_statement(db: Session, filters: dict):
+    # Plain column tuples, no ORM identity map growing with the export
+    query = apply_order_filters(db.query(*EXPORT_COLUMNS), filters)
+    return query.order_by(*NEWEST_FIRST).statement
+
+
+def _format_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def format_ndjson(rows) -> str:
+    return "".join(
+        json.dumps({field: _format_value(value)
+                    for field, value in zip(EXPORT_FIELDS, row)},
+                   ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def format_csv(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_format_value(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+
+def _sync_export(db: Session, filters: dict, formatter, header: str):
+    if header:
+        yield header
+    result = db.execute(
+        export_statement(db, filters).execution_options(stream_results=True))
+    for rows in result.partitions(EXPORT_CHUNK_SIZE):
+        yield formatter(rows)
+
+
+async def _async_export(db: AsyncSession, filters: dict, formatter,
+                        header: str):
+    if header:
+        yield header
+    result = await db.stream(export_statement(db.sync_session, filters))
+    async for rows in result.partitions(EXPORT_CHUNK_SIZE):
+        yield formatter(rows)
+
+
+def export_orders(db, filters: dict, export_format: str):
+    """Iterate the matching orders as chunks of NDJSON or CSV text.
+
+    Rows come from a server-side cursor, so memory use depends on the chunk
+    size only. A sync session gives a plain generator (StreamingResponse
+    runs it on the threadpool), an AsyncSession an async generator.
+    """
+    if export_format == "csv":
+        formatter, header = format_csv, csv_header()
+    else:
+        formatter, header = format_ndjson, ""
+    if isinstance(db, AsyncSession):
+        return _async_export(db, filters, formatter, header)
+    return _sync_export(db, filters, formatter, header)
@@ -0,0 +1,122 @@
+from datetime import datetime
+from typing import Optional
+import logging
+
+from sqlalchemy import desc
+
+from .models import Order
+from .search import brand_search_clause
+
+logger = logging.getLogger(__name__)
+
+# Default list order, id breaks ties between equal created_at values
+NEWEST_FIRST = (desc(Order.created_at), desc(Order.id))
+
+
+def _parse_date(value: str, name: str,
+                end_of_day: bool = False) -> Optional[datetime]:
+    try:
+        # Try parsing with time first
+        return datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            # If that fails, try parsing just the date
+            parsed = datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            logger.warning("Invalid %s format: %s", name, value)
+            return None
+    if end_of_day:
+        # Add end of day time (23:59:59) to include the entire day
+        parsed = parsed.replace(hour=23, minute=59, second=59)
+    return parsed
+
+
+def _parse_price(value: str, name: str) -> Optional[float]:
+    try:
+        # Try to convert to float, handling both comma and dot decimal
+        # separators
+        return float(value.replace(',', '.'))
+    except ValueError:
+        logger.warning("Invalid %s format: %s", name, value)
+    return None
+
+
+def parse_order_filters(
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    price_from: Optional[str] = None,
+    price_to: Optional[str] = None
+) -> dict:
+    """Turn raw query parameters into a dict of valid, typed filters.
+
+    Invalid values are logged and ignored, so equal filter sets always
+    produce equal dicts (see filters_key).
+    """
+    filters = {}
+
+    if search and search.strip():
+        filters["search"] = search.strip()
+
+    if status and status.strip():
+        try:
+            filters["status_id"] = int(status)
+        except ValueError:
+            logger.warning("Invalid status ID format: %s", status)
+
+    if category and category.strip():
+        try:
+            filters["category_id"] = int(category)
+        except ValueError:
+            logger.warning("Invalid category ID format: %s", category)
+
+    if date_from and date_from.strip():
+        date_from_dt = _parse_date(date_from, "date_from")
+        if date_from_dt is not None:
+            filters["date_from"] = date_from_dt
+
+    if date_to and date_to.strip():
+        date_to_dt = _parse_date(date_to, "date_to", end_of_day=True)
+        if date_to_dt is not None:
+            filters["date_to"] = date_to_dt
+
+    if price_from and price_from.strip():
+        price_from_val = _parse_price(price_from, "price_from")
+        if price_from_val is not None:
+            filters["price_from"] = price_from_val
+
+    if price_to and price_to.strip():
+        price_to_val = _parse_price(price_to, "price_to")
+        if price_to_val is not None:
+            filters["price_to"] = price_to_val
+
+    return filters
+
+
+def apply_order_filters(query, filters: dict, model=Order):
+    """Filter a query over orders, or over the archive with
+    model=ArchivedOrder, which has the same columns."""
+    if "search" in filters:
+        query = query.filter(brand_search_clause(
+            query.session, filters["search"], model.brand))
+    if "status_id" in filters:
+        query = query.filter(model.status_id == filters["status_id"])
+    if "category_id" in filters:
+        query = query.filter(
+            model.vehicle_category_id == filters["category_id"])
+    if "date_from" in filters:
+        query = query.filter(model.created_at >= filters["date_from"])
+    if "date_to" in filters:
+        query = query.filter(model.created_at <= filters["date_to"])
+    if "price_from" in filters:
+        query = query.filter(model.price >= filters["price_from"])
+    if "price_to" in filters:
+        query = query.filter(model.price <= filters["price_to"])
+    return query
+
+
+def filters_key(filters: dict) -> tuple:
+    # Hashable, order-independent key for caches
+    return tuple(sorted(filters.items()))
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import os
+import threading
+
+# Rendered GET /api/orders bodies kept per worker, 0 disables the cache
+ORDER_LIST_CACHE_SIZE = int(os.getenv("ORDER_LIST_CACHE_SIZE", "256"))
+
+# Clients always revalidate, a matching ETag costs one token lookup
+REVALIDATE = "no-cache"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison, proxies may add the W/ prefix
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in tags or "*" in tags
+
+
+def list_etag(token: str, params: tuple) -> str:
+    # Weak: estimated totals may differ between identical pages
+    digest = hashlib.sha1(repr((token, params)).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+class BodyCache:
+    """Small LRU of rendered response bodies."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body: bytes):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Keys include the change token, so entries from before a write are never
+# served again, they just age out
+order_list_cache = BodyCache(ORDER_LIST_CACHE_SIZE)
@@ -0,0 +1,126 @@
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+
+# Root log level, INFO and DEBUG records from the app are dropped by default
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+
+# "json" for one JSON object per line, "text" for the classic format
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+# Per-route sampling of request summaries, e.g. "orders.list=0.1,*=1"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "*=1")
+
+# Request summaries are logged at INFO regardless of LOG_LEVEL
+REQUEST_LOGGER = "app.requests"
+
+request_logger = logging.getLogger(REQUEST_LOGGER)
+
+_listener = None
+
+
+def parse_sample_rates(value: str) -> dict:
+    rates = {}
+    for item in value.split(","):
+        route, _, rate = item.partition("=")
+        if not route.strip() or not rate.strip():
+            continue
+        try:
+            rates[route.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+SAMPLE_RATES = parse_sample_rates(LOG_SAMPLE_RATES)
+
+
+def sample_rate(route: str) -> float:
+    return SAMPLE_RATES.get(route, SAMPLE_RATES.get("*", 1.0))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, structured fields under "fields"."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload["fields"] = fields
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(QueueHandler):
+    """Queue handler that leaves message formatting to the listener thread.
+
+    The stock QueueHandler renders the message before enqueueing it, on the
+    request's thread. Records here are only consumed in-process, so they can
+    be passed on as they are.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging():
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    # Requests only put records on the queue, a background thread writes them
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(LazyQueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+    request_logger.setLevel(logging.INFO)
+
+    _listener = QueueListener(
+        log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    global _listener
+    if _listener is not None:
+        # Flushes whatever is still queued
+        _listener.stop()
+        _listener = None
+
+
+def log_request(route: str, started: float, **fields):
+    """Log one summary record for a request, subject to route sampling.
+
+    started is a time.perf_counter() value taken when the request began.
+    """
+    rate = sample_rate(route)
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return
+    if not request_logger.isEnabledFor(logging.INFO):
+        return
+    fields["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if rate < 1:
+        fields["sample_rate"] = rate
+    request_logger.info("%s", route, extra={"fields": fields})
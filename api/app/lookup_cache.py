@@ -0,0 +1,113 @@
+from fastapi import Request, Response
+from typing import Callable, NamedTuple, Optional
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from .database import run_db
+from .http_cache import etag_matches
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached lookup is served before it is reloaded anyway
+LOOKUP_CACHE_TTL = float(os.getenv("LOOKUP_CACHE_TTL", "300"))
+
+# Cache-Control max-age for lookup responses. 0 makes clients revalidate
+# with the ETag every time, which is a cheap 304 from memory.
+LOOKUP_CACHE_MAX_AGE = int(os.getenv("LOOKUP_CACHE_MAX_AGE", "0"))
+
+# Optional file shared by all workers. Touching it tells every worker to
+# drop its cached lookups, see LookupCache.invalidate.
+LOOKUP_CACHE_SIGNAL_FILE = os.getenv("LOOKUP_CACHE_SIGNAL_FILE")
+
+
+class CachedLookup(NamedTuple):
+    body: bytes
+    etag: str
+    expires_at: float
+
+
+class LookupCache:
+    """In-process cache of small lookup tables, stored as rendered JSON."""
+
+    def __init__(self, ttl: float, signal_file: Optional[str] = None):
+        self.ttl = ttl
+        self.signal_file = signal_file
+        self._entries = {}
+        self._generation = 0
+        self._signal_mtime = self._read_signal()
+        self._lock = threading.Lock()
+
+    def _read_signal(self):
+        if not self.signal_file:
+            return None
+        try:
+            return os.stat(self.signal_file).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _check_signal(self):
+        # Another worker invalidated since we last looked
+        mtime = self._read_signal()
+        if mtime != self._signal_mtime:
+            with self._lock:
+                self._signal_mtime = mtime
+                self._generation += 1
+                self._entries.clear()
+
+    def get(self, name: str) -> Optional[CachedLookup]:
+        self._check_signal()
+        entry = self._entries.get(name)
+        if entry is None or entry.expires_at < time.monotonic():
+            return None
+        return entry
+
+    def set(self, name: str, value, generation: int) -> CachedLookup:
+        body = json.dumps(value, ensure_ascii=False,
+                          separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        entry = CachedLookup(body, etag, time.monotonic() + self.ttl)
+        with self._lock:
+            # Do not cache data loaded before an invalidation
+            if generation == self._generation:
+                self._entries[name] = entry
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+        if self.signal_file:
+            try:
+                with open(self.signal_file, "a"):
+                    os.utime(self.signal_file)
+            except OSError as e:
+                logger.warning(
+                    "Could not signal lookup cache invalidation: %s", e)
+            # Our own touch does not need to clear the cache again
+            self._signal_mtime = self._read_signal()
+
+    async def fetch(self, name: str, db, loader: Callable) -> CachedLookup:
+        entry = self.get(name)
+        if entry is None:
+            generation = self._generation
+            value = await run_db(db, loader)
+            entry = self.set(name, value, generation)
+        return entry
+
+
+lookup_cache = LookupCache(LOOKUP_CACHE_TTL, LOOKUP_CACHE_SIGNAL_FILE)
+
+
+def lookup_response(request: Request, entry: CachedLookup) -> Response:
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"max-age={LOOKUP_CACHE_MAX_AGE}, must-revalidate"
+    }
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json",
+                    headers=headers)
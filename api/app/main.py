@@ -1,27 +1,48 @@
 from fastapi import FastAPI, HTTPException
-from .database import engine, Base
+from .database import async_engine, engine, Base
 from .models import Base as ModelsBase  # Rename to avoid confusion
-from .routes import orders, vehicles, health, settings, statuses
+from .routes import orders, vehicles, health, settings, statuses, batch
+from .routes.orders import DEBUG_ENDPOINTS
+from .events import order_events
+from .log import setup_logging
+from .metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from .probe import health_probe
+from .replicas import ReadYourWritesMiddleware
+from .startup import warmup
 from fastapi.middleware.cors import CORSMiddleware
 from init_db import init_db
 from sqlalchemy import text
+import functools
 import logging
 import os
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.encoders import jsonable_encoder
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging, records are written from a background queue listener
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Migrate from the worker itself instead of running init_db.py before
+# the workers, only for single-process setups
+INIT_DB_ON_STARTUP = os.getenv(
+    "INIT_DB_ON_STARTUP", "false").lower() == "true"
+
+# Origins allowed to call the API. Credentials, e.g. the read-your-writes
+# cookie, are only sent by browsers to explicitly allowed origins.
+CORS_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
+    if origin.strip()
+]
+
 app = FastAPI(
     title="Orders API",
     description="API for managing orders and vehicle categories",
     version="1.0.0",
     # Disable automatic trailing slashes
     redirect_slashes=False,
-    default_response_class=JSONResponse
+    default_response_class=ORJSONResponse
 )
 
 # Create an API router for all routes
@@ -31,32 +52,52 @@ api_router = APIRouter()
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up...")
-    try:
-        # Initialize database with optional force recreate
+    migrate = None
+    if INIT_DB_ON_STARTUP:
         force_recreate = os.getenv(
             "FORCE_RECREATE_DB",
             "false").lower() == "true"
-        init_db(force_recreate)
-        logger.info("Database initialization completed")
-    except Exception as e:
-        logger.error(f"Error during startup: {e}")
-        raise
+        migrate = functools.partial(init_db, force_recreate)
+    # Schema check and warm-up run in the background, the worker accepts
+    # connections right away and reports ready once they succeeded
+    await warmup.start(migrate)
+    # Database checks for /ready, cached between runs
+    await health_probe.start()
+    # Order change feed, fed by the write handlers
+    await order_events.start()
 
-# Add CORS middleware to allow requests from your Vue frontend
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await warmup.stop()
+    await health_probe.stop()
+    await order_events.stop()
+    if async_engine is not None:
+        # Async driver connections must be closed on the event loop
+        await async_engine.dispose()
+
+# Add CORS middleware to allow requests from the Vue frontend
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with your frontend URL
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Per-route latency and DB timing, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Clients that just wrote read from the primary, not a lagging replica
+app.add_middleware(ReadYourWritesMiddleware)
+
 # Include routers under the API router
 api_router.include_router(orders.router)
 api_router.include_router(vehicles.router)
 api_router.include_router(health.router)
 api_router.include_router(settings.router)
 api_router.include_router(statuses.router)
+api_router.include_router(batch.router)
 
 # Mount the API router with the /api prefix
 app.include_router(api_router, prefix="/api")
@@ -71,8 +112,28 @@ def read_root():
     }
 
 
+@app.get("/live")
+async def live():
+    # The process is up and serving, nothing else is checked
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    # Answered from the last background probe, never touches the database
+    is_ready, report = health_probe.readiness()
+    return ORJSONResponse(report, status_code=200 if is_ready else 503)
+
+
+@app.get("/metrics")
+def metrics():
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/test-db")
 async def test_db():
+    if not DEBUG_ENDPOINTS:
+        raise HTTPException(status_code=404, detail="Not Found")
     try:
         with engine.connect() as conn:
             result = conn.execute(text("SHOW TABLES"))
@@ -0,0 +1,308 @@
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from typing import Callable, Dict, Iterable, Optional, Tuple
+import bisect
+import threading
+import time
+
+# Prometheus default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75,
+                   1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Buckets for per-request query counts
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...],
+                   extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace(
+        '"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, labels: tuple = ()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labels, labels)} " \
+                  f"{_format_number(value)}"
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple = ()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (
+                    len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def totals(self, labels: tuple = ()) -> Tuple[int, float]:
+        """Observation count and sum for one label set."""
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                return 0, 0.0
+            return sum(series[:-1]), series[-1]
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(labels, list(series))
+                      for labels, series in self._values.items()]
+        for labels, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),),
+                                    series[:-1]):
+                cumulative += count
+                le = 'le="' + _format_number(bound) + '"'
+                yield f"{self.name}_bucket" \
+                      f"{_format_labels(self.labels, labels, le)} {cumulative}"
+            label_text = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {_format_number(series[-1])}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class CallbackGauge:
+    """Gauge whose values are read from a callback at scrape time."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...],
+                 callback: Callable[[], Iterable[Tuple[tuple, float]]]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.callback():
+            yield f"{self.name}{_format_labels(self.labels, labels)} " \
+                  f"{_format_number(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status")))
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "SQL statements executed"))
+DB_QUERY_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds", "Time spent executing single statements"))
+REQUEST_DB_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements executed per request",
+    ("route",), buckets=QUERY_COUNT_BUCKETS))
+REQUEST_DB_DURATION = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in the database per request",
+    ("route",)))
+POOL_CHECKOUT_WAIT = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection", ("engine",)))
+
+# Instrumented engines by name, their pool is looked up at scrape time
+# because dispose() replaces it
+_engines = {}
+
+
+POOL_STATES = ("size", "checked_out", "overflow", "idle")
+
+
+def pool_status() -> Dict[str, dict]:
+    """Current usage of every instrumented QueuePool, by engine name."""
+    status = {}
+    for name, engine in list(_engines.items()):
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        waits, wait_seconds = POOL_CHECKOUT_WAIT.totals((name,))
+        status[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "idle": pool.checkedin(),
+            "checkouts": waits,
+            "avg_checkout_wait_ms": round(
+                wait_seconds / waits * 1000, 3) if waits else 0.0
+        }
+    return status
+
+
+def _pool_stats():
+    for name, stats in pool_status().items():
+        for state in POOL_STATES:
+            yield (state, name), stats[state]
+
+
+registry.register(CallbackGauge(
+    "db_pool_connections", "Connection pool usage",
+    ("state", "engine"), _pool_stats))
+
+
+class RequestDbStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Set per request by MetricsMiddleware, filled by the cursor listeners.
+# Threadpool workers run in a copy of the request context, so they update
+# the same object.
+request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar(
+    "request_db_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    DB_QUERIES.inc()
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = request_db_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+
+def _handle_error(context):
+    # Keep the start-time stack balanced for failed statements
+    if context.connection is None:
+        return
+    started = context.connection.info.get("query_started")
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine, name: str = "primary"):
+    """Count and time statements on engine and track its pool."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    _engines[name] = engine
+
+
+def observe_checkout_wait(pool, started: float):
+    name = next((name for name, engine in _engines.items()
+                 if engine.pool is pool), "unknown")
+    POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, (name,))
+
+
+class MetricsMiddleware:
+    """Records per-route latency and DB usage, adds a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = None
+
+    def _route_label(self, scope) -> str:
+        if self._route_paths is None:
+            # Route templates keep label cardinality bounded
+            router = scope["app"].router
+            self._route_paths = {
+                getattr(route, "endpoint", None): route.path
+                for route in router.routes
+            }
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stats = RequestDbStats()
+        token = request_db_stats.set(stats)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total_ms = (time.perf_counter() - started) * 1000
+                server_timing = (
+                    f"app;dur={total_ms:.1f}, "
+                    f"db;dur={stats.seconds * 1000:.1f};"
+                    f"desc=\"{stats.queries} queries\""
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_db_stats.reset(token)
+            route = self._route_label(scope)
+            REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                (scope["method"], route, str(status_code)))
+            REQUEST_DB_QUERIES.observe(stats.queries, (route,))
+            REQUEST_DB_DURATION.observe(stats.seconds, (route,))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, TIMESTAMP, CheckConstraint, func, Enum
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, TIMESTAMP, CheckConstraint, Index, func, Enum
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.mysql import VARCHAR
 from datetime import datetime
@@ -34,6 +34,19 @@ class Order(Base):
     __tablename__ = "orders"
     __table_args__ = (
         CheckConstraint("price >= 0", name="check_price_non_negative"),
+        # Composite indexes matching the list filters, all ending in the
+        # created_at sort key so filtered pages are read in index order
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_status_created_at", "status_id", "created_at"),
+        Index("ix_orders_category_created_at",
+              "vehicle_category_id", "created_at"),
+        Index("ix_orders_status_category_created_at",
+              "status_id", "vehicle_category_id", "created_at"),
+        Index("ix_orders_price", "price"),
+        # Brand search, the ngram parser indexes every 2-character token so
+        # substring searches do not need a leading-wildcard LIKE scan
+        Index("ix_orders_brand_fulltext", "brand",
+              mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
         {
             'mysql_charset': 'utf8mb4',
             'mysql_collate': 'utf8mb4_slovak_ci'
@@ -53,6 +66,91 @@ class Order(Base):
         ForeignKey("order_statuses.id"),
         nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped on every update, for optimistic concurrency control
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     vehicle_category = relationship("VehicleCategory")
     status = relationship("OrderStatus")
+
+    # ORM flushes check and increment version themselves
+    __mapper_args__ = {"version_id_col": version}
+
+
+class ArchivedOrder(Base):
+    """Old orders in a terminal status, moved out of orders by app.archive.
+
+    Same columns as orders, without foreign keys so the archive does not
+    hold back changes to the lookup tables.
+    """
+
+    __tablename__ = "orders_archive"
+    __table_args__ = (
+        Index("ix_orders_archive_created_at_id", "created_at", "id"),
+        Index("ix_orders_archive_status_created_at",
+              "status_id", "created_at"),
+        Index("ix_orders_archive_brand_fulltext", "brand",
+              mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+        {
+            'mysql_charset': 'utf8mb4',
+            'mysql_collate': 'utf8mb4_slovak_ci'
+        }
+    )
+
+    # Keeps the id the order had in the live table
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    vehicle_category_id = Column(Integer, nullable=True)
+    brand = Column(VARCHAR(255, charset='utf8mb4', collation='utf8mb4_slovak_ci'),
+                   nullable=False)
+    price = Column(Float, nullable=False)
+    status_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class OrderDailyRollup(Base):
+    """Per-day order aggregates, kept in step with orders by app.rollups."""
+
+    __tablename__ = "order_rollups_daily"
+    __table_args__ = {
+        'mysql_charset': 'utf8mb4',
+        'mysql_collate': 'utf8mb4_slovak_ci'
+    }
+
+    day = Column(Date, primary_key=True)
+    status_id = Column(Integer, primary_key=True, autoincrement=False)
+    # 0 stands for orders without a category, NULL cannot be part of the key
+    vehicle_category_id = Column(
+        Integer, primary_key=True, autoincrement=False)
+    brand = Column(VARCHAR(255, charset='utf8mb4', collation='utf8mb4_slovak_ci'),
+                   primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    price_sum = Column(Float, nullable=False, default=0)
+    price_min = Column(Float, nullable=False)
+    price_max = Column(Float, nullable=False)
+
+
+class ChangeToken(Base):
+    """Opaque token replaced whenever the data it stands for changes."""
+
+    __tablename__ = "change_tokens"
+    __table_args__ = {
+        'mysql_charset': 'utf8mb4',
+        'mysql_collate': 'utf8mb4_slovak_ci'
+    }
+
+    name = Column(String(64), primary_key=True)
+    token = Column(String(32), nullable=False)
+
+
+class SchemaVersion(Base):
+    """One row per applied schema migration, see app.schema."""
+
+    __tablename__ = "schema_version"
+    __table_args__ = {
+        'mysql_charset': 'utf8mb4',
+        'mysql_collate': 'utf8mb4_slovak_ci'
+    }
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,40 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+# Opaque cursors for keyset pagination over (created_at, id)
+
+CURSOR_NEXT = "next"
+CURSOR_PREV = "prev"
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, order_id: int, direction: str) -> str:
+    payload = {
+        "c": created_at.isoformat(),
+        "i": order_id,
+        "d": direction
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    # Restore the padding stripped in encode_cursor
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        created_at = datetime.fromisoformat(payload["c"])
+        order_id = int(payload["i"])
+        direction = payload["d"]
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+
+    if direction not in (CURSOR_NEXT, CURSOR_PREV):
+        raise InvalidCursorError(f"Invalid cursor direction: {direction}")
+
+    return created_at, order_id, direction
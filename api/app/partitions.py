@@ -0,0 +1,240 @@
+"""Monthly RANGE partitioning of the orders table (MySQL, optional).
+
+With ORDER_PARTITIONS=true, init_db converts orders to one partition per
+created_at month plus a catch-all `pmax` partition, and
+maintain_partitions keeps ORDER_PARTITION_MONTHS_AHEAD empty months ready
+and drops months older than ORDER_PARTITION_RETENTION_MONTHS. Run it
+regularly, e.g. daily from cron:
+
+    python -m app.partitions
+
+MySQL does not support foreign keys or FULLTEXT indexes on partitioned
+tables, and every unique key must contain created_at, so the conversion
+drops the orders foreign keys (app.references checks the lookup ids
+instead) and the brand FULLTEXT index (search falls back to LIKE) and
+makes the primary key (id, created_at).
+"""
+from datetime import date, datetime, time
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+import logging
+import os
+
+from .change_tokens import ORDERS_TOKEN, bump_token
+from .models import Order, OrderDailyRollup
+from .rollups import rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+ORDER_PARTITIONS = os.getenv("ORDER_PARTITIONS", "false").lower() == "true"
+
+# Empty future months kept ahead of time, so inserts never land in pmax
+PARTITION_MONTHS_AHEAD = int(os.getenv("ORDER_PARTITION_MONTHS_AHEAD", "3"))
+
+# Months of orders to keep, older partitions are dropped. 0 keeps all.
+PARTITION_RETENTION_MONTHS = int(
+    os.getenv("ORDER_PARTITION_RETENTION_MONTHS", "0"))
+
+FUTURE_PARTITION = "pmax"
+
+# Filters the rollups count exactly like the orders query does. Brand
+# search is left out, FULLTEXT and LIKE matching can differ.
+BOUNDABLE_FILTERS = {"status_id", "category_id", "date_from", "date_to"}
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+
+def partition_month(name: str) -> date:
+    return datetime.strptime(name, "p%Y%m").date()
+
+
+def month_range(first: date, last: date) -> List[date]:
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def partition_definitions(months: List[date]) -> str:
+    """PARTITION clauses for months followed by the catch-all pmax."""
+    clauses = [
+        f"PARTITION {partition_name(month)} "
+        f"VALUES LESS THAN ('{add_months(month, 1).isoformat()}')"
+        for month in months
+    ]
+    clauses.append(
+        f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return ", ".join(clauses)
+
+
+def orders_partitions(conn) -> List[str]:
+    """Partition names of the orders table, oldest first. Empty if the
+    table is not partitioned."""
+    if conn.dialect.name != "mysql":
+        return []
+    return list(conn.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'orders' "
+        "AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION")).scalars())
+
+
+def partition_orders(conn, today: Optional[date] = None) -> bool:
+    """Convert orders to monthly partitions, once. True if it converted.
+
+    Rewrites the whole table, run it during a maintenance window.
+    """
+    if conn.dialect.name != "mysql" or orders_partitions(conn):
+        return False
+    today = today or date.today()
+    inspector = inspect(conn)
+    for foreign_key in inspector.get_foreign_keys("orders"):
+        conn.execute(text(
+            f"ALTER TABLE orders DROP FOREIGN KEY `{foreign_key['name']}`"))
+    for index in inspector.get_indexes("orders"):
+        if index.get("dialect_options", {}).get("mysql_prefix") == "FULLTEXT":
+            conn.execute(text(f"ALTER TABLE orders DROP INDEX `{index['name']}`"))
+
+    first = conn.execute(select(func.min(Order.created_at))).scalar() or today
+    months = month_range(first, add_months(month_start(today),
+                                           PARTITION_MONTHS_AHEAD))
+    # The partitioning column must be part of every unique key
+    conn.execute(text(
+        "ALTER TABLE orders MODIFY created_at DATETIME NOT NULL, "
+        "DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)"))
+    conn.execute(text(
+        "ALTER TABLE orders PARTITION BY RANGE COLUMNS(created_at) "
+        f"({partition_definitions(months)})"))
+    logger.info("Partitioned orders into %d months", len(months))
+    return True
+
+
+def add_future_partitions(conn, partitions: List[str],
+                          today: date) -> List[str]:
+    monthly = [name for name in partitions if name != FUTURE_PARTITION]
+    if not monthly:
+        return []
+    last = add_months(month_start(today), PARTITION_MONTHS_AHEAD)
+    months = month_range(add_months(partition_month(monthly[-1]), 1), last)
+    if months:
+        # pmax is empty while months ahead exist, splitting it is cheap
+        conn.execute(text(
+            f"ALTER TABLE orders REORGANIZE PARTITION {FUTURE_PARTITION} "
+            f"INTO ({partition_definitions(months)})"))
+    return [partition_name(month) for month in months]
+
+
+def drop_old_partitions(conn, partitions: List[str],
+                        today: date) -> Tuple[List[str], Optional[date]]:
+    """Drop months past the retention, returns them and the new lower
+    bound of the data."""
+    if not PARTITION_RETENTION_MONTHS:
+        return [], None
+    cutoff = add_months(month_start(today), -PARTITION_RETENTION_MONTHS)
+    old = [name for name in partitions
+           if name != FUTURE_PARTITION and partition_month(name) < cutoff]
+    if old:
+        conn.execute(text(
+            f"ALTER TABLE orders DROP PARTITION {', '.join(old)}"))
+    return old, cutoff
+
+
+def maintain_partitions(db: Session, today: Optional[date] = None) -> dict:
+    """Add future months and drop expired ones. The rollups of the dropped
+    months are recomputed and the orders change token is bumped."""
+    today = today or date.today()
+    conn = db.connection()
+    partitions = orders_partitions(conn)
+    if not partitions:
+        return {"added": [], "dropped": []}
+    added = add_future_partitions(conn, partitions, today)
+    dropped, cutoff = drop_old_partitions(conn, partitions, today)
+    if dropped:
+        # Archived orders of those days are still counted
+        rebuild_rollups(db, before=cutoff)
+        bump_token(db, ORDERS_TOKEN)
+    db.commit()
+    if added or dropped:
+        logger.info("Order partitions added: %s, dropped: %s",
+                    added, dropped)
+    return {"added": added, "dropped": dropped}
+
+
+def pruning_bound(db: Session, filters: dict, rows_needed: int,
+                  before: Optional[datetime] = None,
+                  after: Optional[datetime] = None) -> Optional[datetime]:
+    """Lower created_at bound that still holds the newest rows_needed
+    matching orders at or before `before`, from the daily rollups.
+
+    As an explicit predicate it lets MySQL skip the partitions of older
+    months. None when the filters cannot be counted from the rollups or
+    fewer rows match anyway. The rollups include archived orders, for a
+    list of live orders only pass the archive watermark as `after`.
+    """
+    if set(filters) - BOUNDABLE_FILTERS:
+        return None
+    date_from = filters.get("date_from")
+    if date_from is not None and date_from.time() != time.min:
+        return None
+
+    rollup = OrderDailyRollup
+    query = db.query(rollup.day, func.sum(rollup.order_count))
+    if "status_id" in filters:
+        query = query.filter(rollup.status_id == filters["status_id"])
+    if "category_id" in filters:
+        query = query.filter(
+            rollup.vehicle_category_id == filters["category_id"])
+    if date_from is not None:
+        query = query.filter(rollup.day >= date_from.date())
+    upper = filters.get("date_to")
+    if before is not None and (upper is None or before < upper):
+        upper = before
+    if upper is not None:
+        # The day of the upper bound also holds rows after it, only
+        # earlier days are sure to count completely
+        query = query.filter(rollup.day < upper.date())
+
+    if after is not None:
+        # Days up to the newest archived order may count archived rows
+        query = query.filter(rollup.day > after.date())
+
+    found = 0
+    for day, count in query.group_by(rollup.day).order_by(rollup.day.desc()):
+        found += count
+        if found >= rows_needed:
+            return datetime.combine(day, time.min)
+    return None
+
+
+def main():
+    from .database import SessionLocal
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        if not orders_partitions(db.connection()):
+            print("The orders table is not partitioned, run init_db with "
+                  "ORDER_PARTITIONS=true first")
+            return
+        result = maintain_partitions(db)
+        print(f"Added partitions: {', '.join(result['added']) or '-'}")
+        print(f"Dropped partitions: {', '.join(result['dropped']) or '-'}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Cached health probe behind GET /live and GET /ready.
+
+A background task checks the databases every HEALTH_PROBE_INTERVAL
+seconds over its own single-connection engines and keeps the result in
+memory. Probe requests only read that result, so orchestrators polling
+many workers add no database load and never take request connections.
+
+A worker is ready once its warm-up finished (see app.startup) and the
+last probe found the primary reachable, the request pools below
+HEALTH_POOL_SATURATION and, with replicas configured, at least one
+replica reachable and within HEALTH_MAX_REPLICA_LAG.
+"""
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+import time
+
+from .database import DATABASE_URL, POOL_SETTINGS
+from .metrics import pool_status
+from .replicas import DATABASE_REPLICA_URLS
+from .startup import warmup
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "5"))
+
+# Share of a pool's connections (size plus overflow) in use at which the
+# worker stops reporting ready, so traffic goes to less busy workers
+HEALTH_POOL_SATURATION = float(os.getenv("HEALTH_POOL_SATURATION", "0.9"))
+
+# Seconds a replica may lag behind the primary and still count as healthy
+HEALTH_MAX_REPLICA_LAG = float(os.getenv("HEALTH_MAX_REPLICA_LAG", "30"))
+
+PRIMARY = "primary"
+
+
+def probe_engine(url: str):
+    # One connection, separate from the request pools
+    return create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_recycle=POOL_SETTINGS["pool_recycle"],
+        pool_pre_ping=True
+    )
+
+
+def replication_lag(conn) -> Optional[float]:
+    """Seconds a MySQL replica is behind its source, None if it does not
+    replicate (not a replica, or replication stopped)."""
+    row = conn.execute(text("SHOW REPLICA STATUS")).mappings().first()
+    if row is None or row["Seconds_Behind_Source"] is None:
+        return None
+    return float(row["Seconds_Behind_Source"])
+
+
+def check_database(engine, replica: bool = False) -> dict:
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            lag = None
+            if replica and conn.dialect.name == "mysql":
+                lag = replication_lag(conn)
+                if lag is None:
+                    return {"ok": False, "error": "replication is not running"}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    result = {"ok": True,
+              "latency_ms": round((time.perf_counter() - started) * 1000, 3)}
+    if lag is not None:
+        result["lag_seconds"] = lag
+        if lag > HEALTH_MAX_REPLICA_LAG:
+            result["ok"] = False
+            result["error"] = f"replica is {lag:.0f}s behind"
+    return result
+
+
+def check_pools(saturation: float = HEALTH_POOL_SATURATION) -> dict:
+    """Connection usage of this worker's request pools, from memory."""
+    pools = {}
+    ok = True
+    for name, stats in pool_status().items():
+        capacity = stats["size"] + POOL_SETTINGS["max_overflow"]
+        usage = stats["checked_out"] / capacity if capacity else 0.0
+        pools[name] = round(usage, 3)
+        if usage >= saturation:
+            ok = False
+    result = {"ok": ok, "usage": pools}
+    if not ok:
+        result["error"] = "connection pool saturated"
+    return result
+
+
+class HealthProbe:
+    def __init__(self, engines: Dict[str, object],
+                 interval: float = HEALTH_PROBE_INTERVAL):
+        self.engines = engines
+        self.interval = interval
+        self.checks: Dict[str, dict] = {}
+        self.checked_at: Optional[float] = None
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Health probe failed")
+            await asyncio.sleep(self.interval)
+
+    def _check_databases(self) -> Dict[str, dict]:
+        return {
+            name: check_database(engine, replica=name != PRIMARY)
+            for name, engine in self.engines.items()
+        }
+
+    async def check(self):
+        checks = await run_in_threadpool(self._check_databases)
+        checks["pool"] = check_pools()
+        for name, check in checks.items():
+            if not check["ok"] and self.checks.get(name, {}).get("ok", True):
+                logger.warning("Health check %s failed: %s",
+                               name, check.get("error"))
+        self.checks = checks
+        self.checked_at = time.monotonic()
+
+    @property
+    def healthy(self) -> bool:
+        # A probe that stopped reporting is not trusted either
+        if self.checked_at is None or \
+                time.monotonic() - self.checked_at > self.interval * 3:
+            return False
+        replicas = [check for name, check in self.checks.items()
+                    if name not in (PRIMARY, "pool")]
+        return self.checks[PRIMARY]["ok"] and self.checks["pool"]["ok"] and \
+            (not replicas or any(check["ok"] for check in replicas))
+
+    def readiness(self) -> Tuple[bool, dict]:
+        """(ready, report) from the last probe, without any I/O."""
+        ready = warmup.ready and self.healthy
+        age = None
+        if self.checked_at is not None:
+            age = round(time.monotonic() - self.checked_at, 3)
+        return ready, {
+            "ready": ready,
+            "warm": warmup.ready,
+            "warmup_error": warmup.error,
+            "checked_seconds_ago": age,
+            "checks": self.checks
+        }
+
+
+health_probe = HealthProbe({
+    PRIMARY: probe_engine(DATABASE_URL),
+    **{f"replica{index}": probe_engine(url)
+       for index, url in enumerate(DATABASE_REPLICA_URLS)}
+})
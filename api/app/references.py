@@ -0,0 +1,58 @@
+"""Application-level checks of the order lookup ids.
+
+Partitioned orders (see app.partitions) and orders_archive have no
+foreign keys, so order writes check their status and category ids here,
+and statuses and categories are only deleted while no live or archived
+order uses them.
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Iterable, List, Set
+
+from .models import ArchivedOrder, Order, OrderStatus, VehicleCategory
+
+# Order column -> lookup table it refers to
+REFERENCES = {
+    "status_id": OrderStatus,
+    "vehicle_category_id": VehicleCategory
+}
+
+
+def _existing_ids(db: Session, model, ids: Set[int]) -> Set[int]:
+    if not ids:
+        return set()
+    # Shared locks, a concurrent delete of the lookup row waits for the
+    # caller's transaction and then finds the new orders, see lookup_in_use
+    return set(db.execute(
+        select(model.id)
+        .where(model.id.in_(ids))
+        .with_for_update(read=True)
+    ).scalars())
+
+
+def reference_errors(db: Session, rows: List[dict]) -> List[List[str]]:
+    """Errors per row for status and category ids that do not exist.
+
+    Rows may hold only some of the columns, e.g. a partial update.
+    """
+    missing = {}
+    for column, model in REFERENCES.items():
+        ids = {row[column] for row in rows if row.get(column) is not None}
+        missing[column] = ids - _existing_ids(db, model, ids)
+    return [
+        [f"Unknown {column}: {row[column]}" for column in REFERENCES
+         if row.get(column) is not None and row[column] in missing[column]]
+        for row in rows
+    ]
+
+
+def lookup_in_use(db: Session, column: str, lookup_id: int,
+                  models: Iterable = (Order, ArchivedOrder)) -> bool:
+    """Whether any live or archived order refers to the lookup id. Lock
+    the lookup row first."""
+    return any(
+        db.execute(select(model.id)
+                   .where(getattr(model, column) == lookup_id)
+                   .limit(1)).first() is not None
+        for model in models
+    )
@@ -0,0 +1,126 @@
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+import itertools
+import os
+import time
+
+from .database import (DB_ASYNC, POOL_SETTINGS, AsyncSessionLocal,
+                       InstrumentedAsyncQueuePool, InstrumentedQueuePool,
+                       SessionLocal, configure_pool_events, engine_options,
+                       set_utf8mb4, to_async_url)
+from .metrics import instrument_engine
+
+# Comma-separated read replica URLs, read-only handlers are spread over
+# them. Without any, everything reads from DATABASE_URL.
+DATABASE_REPLICA_URLS = [
+    url.strip()
+    for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")
+    if url.strip()
+]
+
+# After a write, the client reads from the primary for this many seconds
+# so it sees its own change even if the replicas lag behind
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+PRIMARY_COOKIE = "db_primary_until"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# POST endpoints that only read, calling them does not pin the client to
+# the primary
+READ_ONLY_PATHS = {"/api/orders/batch/get", "/api/batch"}
+
+replica_engines = []
+ReplicaSessions = []
+for index, url in enumerate(DATABASE_REPLICA_URLS):
+    if DB_ASYNC:
+        replica = create_async_engine(
+            to_async_url(url),
+            poolclass=InstrumentedAsyncQueuePool,
+            **engine_options(POOL_SETTINGS)
+        )
+        sync_engine = replica.sync_engine
+        factory = sessionmaker(replica, class_=AsyncSession, autoflush=False,
+                               expire_on_commit=False)
+    else:
+        replica = sync_engine = create_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            **engine_options(POOL_SETTINGS)
+        )
+        factory = sessionmaker(autocommit=False, autoflush=False,
+                               bind=replica, expire_on_commit=False)
+    event.listen(sync_engine, 'connect', set_utf8mb4)
+    configure_pool_events(sync_engine)
+    instrument_engine(sync_engine, f"replica{index}")
+    replica_engines.append(replica)
+    ReplicaSessions.append(factory)
+
+_next_replica = itertools.count()
+
+
+def reads_from_primary(request: Request) -> bool:
+    """Whether the client wrote recently and must not read stale data."""
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE)) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+
+def read_session_factory(request: Request):
+    if not ReplicaSessions or reads_from_primary(request):
+        return AsyncSessionLocal if DB_ASYNC else SessionLocal
+    # Round robin over the replicas
+    return ReplicaSessions[next(_next_replica) % len(ReplicaSessions)]
+
+
+# Dependency for read-only handlers, a replica session unless the client
+# is inside its read-your-writes window
+if DB_ASYNC:
+    async def get_read_db(request: Request):
+        async with read_session_factory(request)() as db:
+            yield db
+else:
+    def get_read_db(request: Request):
+        db = read_session_factory(request)()
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def primary_cookie(seconds: float = READ_YOUR_WRITES_SECONDS) -> str:
+    # The expiry is also in the value, clients that ignore Max-Age still
+    # fall back to the replicas after the window
+    until = time.time() + seconds
+    return (f"{PRIMARY_COOKIE}={until:.3f}; Max-Age={int(seconds) or 1}; "
+            f"Path=/; HttpOnly; SameSite=Lax")
+
+
+class ReadYourWritesMiddleware:
+    """Pins a client to the primary for a while after a successful write."""
+
+    def __init__(self, app, enabled: bool = bool(DATABASE_REPLICA_URLS),
+                 read_only_paths=READ_ONLY_PATHS):
+        self.app = app
+        self.enabled = enabled
+        self.read_only_paths = read_only_paths
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or \
+                scope["method"] in SAFE_METHODS or \
+                scope["path"] in self.read_only_paths:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and \
+                    message["status"] < 400:
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", primary_cookie().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
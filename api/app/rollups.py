@@ -0,0 +1,235 @@
+from datetime import date, datetime
+from sqlalchemy import (Date, and_, case, delete, func, insert, select, true,
+                        tuple_, union_all, update)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Iterable, NamedTuple, Optional
+
+from .models import ArchivedOrder, Order, OrderDailyRollup
+
+# Rollup rows cannot hold NULL in the key, orders without a category go here
+NO_CATEGORY = 0
+
+
+class RollupKey(NamedTuple):
+    day: date
+    status_id: int
+    vehicle_category_id: int
+    brand: str
+
+
+class _Delta:
+    __slots__ = ("count", "total", "low", "high")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.low = None
+        self.high = None
+
+    def add(self, price: float):
+        self.count += 1
+        self.total += price
+        self.low = price if self.low is None else min(self.low, price)
+        self.high = price if self.high is None else max(self.high, price)
+
+
+def order_values(order) -> dict:
+    """The fields of an order (ORM object or mapping) the rollups depend on."""
+    if not isinstance(order, dict):
+        order = {column: getattr(order, column) for column in (
+            "created_at", "status_id", "vehicle_category_id", "brand", "price")}
+    return order
+
+
+def rollup_key(values: dict) -> RollupKey:
+    created_at = values["created_at"]
+    return RollupKey(
+        created_at.date() if isinstance(created_at, datetime) else created_at,
+        values["status_id"],
+        values["vehicle_category_id"] or NO_CATEGORY,
+        values["brand"]
+    )
+
+
+def _group(rows: Iterable[dict]) -> dict:
+    deltas = {}
+    for values in rows:
+        key = rollup_key(values)
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = _Delta()
+        delta.add(values["price"])
+    return deltas
+
+
+def _key_clause(key: RollupKey):
+    return and_(*(getattr(OrderDailyRollup, field) == value
+                  for field, value in key._asdict().items()))
+
+
+def _increment(db: Session, key: RollupKey, delta: _Delta) -> int:
+    rollup = OrderDailyRollup
+    return db.execute(
+        update(rollup)
+        .where(_key_clause(key))
+        .values(
+            order_count=rollup.order_count + delta.count,
+            price_sum=rollup.price_sum + delta.total,
+            price_min=case((rollup.price_min > delta.low, delta.low),
+                           else_=rollup.price_min),
+            price_max=case((rollup.price_max < delta.high, delta.high),
+                           else_=rollup.price_max)
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def add_to_rollups(db: Session, rows: Iterable[dict]):
+    """Count rows (see order_values) into their daily rollups.
+
+    Runs in the caller's transaction, after the orders have been written,
+    so the rollups commit or roll back together with them. Each bucket is an
+    UPDATE with relative increments, the INSERT only happens for a new one.
+    """
+    for key, delta in _group(rows).items():
+        if _increment(db, key, delta):
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(OrderDailyRollup).values(
+                    **key._asdict(),
+                    order_count=delta.count,
+                    price_sum=delta.total,
+                    price_min=delta.low,
+                    price_max=delta.high
+                ))
+        except IntegrityError:
+            # A concurrent transaction created the bucket first
+            _increment(db, key, delta)
+
+
+def _bucket_bounds(db: Session, key: RollupKey):
+    # Archived orders of the day are still part of the bucket
+    start = datetime.combine(key.day, datetime.min.time())
+    end = datetime.combine(key.day, datetime.max.time())
+    low = high = None
+    for model in (Order, ArchivedOrder):
+        category = model.vehicle_category_id
+        if key.vehicle_category_id == NO_CATEGORY:
+            category_clause = category.is_(None)
+        else:
+            category_clause = category == key.vehicle_category_id
+        tier_low, tier_high = db.execute(
+            select(func.min(model.price), func.max(model.price))
+            .where(model.status_id == key.status_id,
+                   category_clause,
+                   model.created_at.between(start, end),
+                   model.brand == key.brand)
+        ).one()
+        if tier_low is not None:
+            low = tier_low if low is None else min(low, tier_low)
+            high = tier_high if high is None else max(high, tier_high)
+    return low, high
+
+
+def remove_from_rollups(db: Session, rows: Iterable[dict]):
+    """Take rows out of their daily rollups.
+
+    The orders must already be deleted or changed in the session (flushed),
+    min/max are recomputed from the remaining orders of a bucket when a
+    removed price was one of its extremes.
+    """
+    rollup = OrderDailyRollup
+    for key, delta in _group(rows).items():
+        current = db.execute(
+            select(rollup.order_count, rollup.price_min, rollup.price_max)
+            .where(_key_clause(key))
+            .with_for_update()
+        ).first()
+        if current is None:
+            continue
+        if current.order_count <= delta.count:
+            db.execute(delete(rollup).where(_key_clause(key))
+                       .execution_options(synchronize_session=False))
+            continue
+
+        values = {
+            "order_count": rollup.order_count - delta.count,
+            "price_sum": rollup.price_sum - delta.total
+        }
+        if delta.low <= current.price_min or delta.high >= current.price_max:
+            low, high = _bucket_bounds(db, key)
+            if low is not None:
+                values["price_min"] = low
+                values["price_max"] = high
+        db.execute(update(rollup).where(_key_clause(key)).values(**values)
+                   .execution_options(synchronize_session=False))
+
+
+def move_in_rollups(db: Session, old: dict, new: dict):
+    """Rollup maintenance for an updated order, old/new from order_values."""
+    if old == new:
+        return
+    remove_from_rollups(db, [old])
+    add_to_rollups(db, [new])
+
+
+def _recount(db: Session, where, keys=None):
+    # One grouped INSERT ... SELECT over the live and archived orders that
+    # match where(model), with keys only into those buckets
+    orders = union_all(*(
+        select(model.created_at, model.status_id, model.vehicle_category_id,
+               model.brand, model.price)
+        .where(where(model))
+        for model in (Order, ArchivedOrder)
+    )).subquery()
+    day = func.date(orders.c.created_at, type_=Date)
+    category = func.coalesce(orders.c.vehicle_category_id, NO_CATEGORY)
+    bucket = (day, orders.c.status_id, category, orders.c.brand)
+    query = select(*bucket,
+                   func.count(), func.sum(orders.c.price),
+                   func.min(orders.c.price), func.max(orders.c.price))
+    if keys is not None:
+        query = query.where(tuple_(*bucket).in_(keys))
+    db.execute(insert(OrderDailyRollup).from_select(
+        ["day", "status_id", "vehicle_category_id", "brand",
+         "order_count", "price_sum", "price_min", "price_max"],
+        query.group_by(*bucket)
+    ))
+
+
+def refresh_rollups(db: Session, rows: Iterable[dict]):
+    """Recompute the daily rollups that rows (see order_values) fall into.
+
+    For writes of many orders at once, e.g. the batch endpoints: one DELETE
+    of the buckets and one INSERT ... SELECT that counts them again from
+    the live and archived orders, however many buckets are touched. Pass
+    the old and the new values, the orders must already be written
+    (flushed).
+    """
+    keys = sorted(set(map(rollup_key, rows)))
+    if not keys:
+        return
+    rollup = OrderDailyRollup
+    db.execute(
+        delete(rollup)
+        .where(tuple_(rollup.day, rollup.status_id, rollup.vehicle_category_id,
+                      rollup.brand).in_(keys))
+        .execution_options(synchronize_session=False)
+    )
+    # The date range and statuses keep the recount on the orders' indexes
+    start = datetime.combine(keys[0].day, datetime.min.time())
+    end = datetime.combine(max(key.day for key in keys), datetime.max.time())
+    status_ids = {key.status_id for key in keys}
+    _recount(db, lambda model: and_(model.created_at.between(start, end),
+                                    model.status_id.in_(status_ids)),
+             keys)
+
+
+def rebuild_rollups(db: Session, before: Optional[date] = None):
+    """Recompute the rollups from the live and archived orders, e.g. as a
+    backfill. With before, only the days before that date."""
+    db.execute(delete(OrderDailyRollup).where(
+        OrderDailyRollup.day < before if before else true()))
+    _recount(db, lambda model: model.created_at < before if before else true())
@@ -0,0 +1,166 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, Dict, List, Optional
+import orjson
+import os
+import time
+
+from ..database import DbSession, run_db
+from ..replicas import get_read_db
+from ..change_tokens import ORDERS_TOKEN, current_token
+from ..counts import TOTAL_MODE_EXACT
+from ..filters import parse_order_filters
+from ..http_cache import order_list_cache
+from ..log import log_request
+from ..lookup_cache import lookup_cache
+from ..serialization import json_response, order_page_response
+from .orders import list_cache_key, list_orders, read_order
+from .statuses import _get_statuses
+from .vehicles import _get_vehicle_categories
+
+router = APIRouter(
+    prefix="/batch",
+    tags=["batch"]
+)
+
+# Maximum number of operations in one batch request
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "20"))
+
+OP_ORDERS_LIST = "orders.list"
+OP_ORDERS_GET = "orders.get"
+OP_STATUSES = "statuses"
+OP_VEHICLE_CATEGORIES = "vehicle_categories"
+
+# Lookup operations, answered from the lookup cache
+LOOKUPS = {
+    OP_STATUSES: _get_statuses,
+    OP_VEHICLE_CATEGORIES: _get_vehicle_categories
+}
+
+
+class OrderListParams(BaseModel):
+    # Same parameters and limits as GET /api/orders
+    page: int = Field(1, ge=1)
+    per_page: int = Field(20, ge=1, le=100)
+    search: Optional[str] = None
+    status: Optional[str] = None
+    category: Optional[str] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    price_from: Optional[str] = None
+    price_to: Optional[str] = None
+    pagination: str = Field("page", regex="^(page|cursor)$")
+    cursor: Optional[str] = None
+    total_mode: str = Field(TOTAL_MODE_EXACT, regex="^(exact|estimate|none)$")
+
+
+class OrderGetParams(BaseModel):
+    order_id: int
+
+
+class BatchOperation(BaseModel):
+    id: Optional[str] = None
+    op: str = Field(..., regex="^(orders\\.list|orders\\.get|statuses|"
+                               "vehicle_categories)$")
+    params: Dict[str, Any] = {}
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(
+        ..., min_items=1, max_items=BATCH_MAX_OPERATIONS)
+
+
+def _list_page(db: Session, params: dict, token: Optional[str]):
+    params = OrderListParams(**params)
+    filters = parse_order_filters(
+        params.search, params.status, params.category, params.date_from,
+        params.date_to, params.price_from, params.price_to)
+    key = list_cache_key(filters, params.page, params.per_page,
+                         params.pagination, params.cursor, params.total_mode)
+    # Shares the rendered pages with GET /api/orders
+    body = order_list_cache.get((token, key)) if token is not None else None
+    if body is None:
+        result = list_orders(
+            db, filters,
+            page=params.page,
+            per_page=params.per_page,
+            cursor_mode=params.pagination == "cursor",
+            cursor=params.cursor,
+            total_mode=params.total_mode
+        )
+        body = order_page_response(result).body
+        if token is not None:
+            order_list_cache.set((token, key), body)
+    return orjson.Fragment(body)
+
+
+def _get_order(db: Session, params: dict, token: Optional[str]) -> dict:
+    return read_order(db, OrderGetParams(**params).order_id)
+
+
+ORDER_OPERATIONS = {
+    OP_ORDERS_LIST: _list_page,
+    OP_ORDERS_GET: _get_order
+}
+
+
+def _result(operation: BatchOperation, status: int, body) -> dict:
+    return {"id": operation.id, "status": status, "body": body}
+
+
+def _run_operation(db: Session, operation: BatchOperation,
+                   token: Optional[str]) -> dict:
+    try:
+        body = ORDER_OPERATIONS[operation.op](db, operation.params, token)
+    except ValidationError as e:
+        return _result(operation, 422, {"detail": e.errors()})
+    except HTTPException as e:
+        return _result(operation, e.status_code, {"detail": e.detail})
+    return _result(operation, 200, body)
+
+
+def _run_order_operations(db: Session,
+                          operations: List[BatchOperation]) -> List[dict]:
+    # All reads share the session's transaction, so InnoDB answers them
+    # from one consistent snapshot. The token is read in it as well.
+    token = current_token(db, ORDERS_TOKEN)
+    return [_run_operation(db, operation, token) for operation in operations]
+
+
+@router.post("")
+async def run_batch(batch: BatchRequest,
+                    db: DbSession = Depends(get_read_db)):
+    """Several read operations in one request, e.g. the lookups and the
+    first order page a page load needs.
+
+    Results are returned in request order as {id, status, body}; a failed
+    operation does not fail the others.
+    """
+    started = time.perf_counter()
+    results = {}
+
+    # Lookups normally come from memory without touching the database
+    for index, operation in enumerate(batch.operations):
+        if operation.op in LOOKUPS:
+            entry = await lookup_cache.fetch(
+                operation.op, db, LOOKUPS[operation.op])
+            results[index] = _result(
+                operation, 200, orjson.Fragment(entry.body))
+
+    # Everything else in a single trip to the threadpool
+    order_operations = [
+        (index, operation) for index, operation in enumerate(batch.operations)
+        if operation.op in ORDER_OPERATIONS
+    ]
+    if order_operations:
+        order_results = await run_db(
+            db, _run_order_operations,
+            [operation for _, operation in order_operations])
+        for (index, _), result in zip(order_operations, order_results):
+            results[index] = result
+
+    log_request("batch", started,
+                ops=[operation.op for operation in batch.operations])
+    return json_response(
+        {"results": [results[index] for index in range(len(results))]})
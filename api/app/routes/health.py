@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from ..database import SessionLocal, engine
+from fastapi import APIRouter
+from ..database import POOL_SETTINGS, WEB_CONCURRENCY
+from ..metrics import pool_status
+from ..probe import PRIMARY, health_probe
+import os
 
 router = APIRouter(
     prefix="/health",
@@ -9,24 +10,31 @@ router = APIRouter(
 )
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @router.get("/")
-def health_check(db: Session = Depends(get_db)):
-    try:
-        # Test database connection
-        db.execute(text("SELECT 1"))
+def health_check():
+    # From the background probe, see /ready for the full report
+    is_ready, report = health_probe.readiness()
+    primary = report["checks"].get(PRIMARY)
+    if primary is None:
+        db_status = "unknown"
+    elif primary["ok"]:
         db_status = "connected"
-    except Exception as e:
-        db_status = f"error: {str(e)}"
+    else:
+        db_status = f"error: {primary['error']}"
 
     return {
         "status": "healthy",
-        "database": db_status
+        "database": db_status,
+        "ready": is_ready
+    }
+
+
+@router.get("/pool")
+def pool_stats():
+    # Pools are per process, this is the worker that served the request
+    return {
+        "pid": os.getpid(),
+        "workers": WEB_CONCURRENCY,
+        "settings": POOL_SETTINGS,
+        "pools": pool_status()
     }
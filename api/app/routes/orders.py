@@ -1,41 +1,280 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import (APIRouter, HTTPException, Depends, Header, Query,
+                     Request, Response)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
-from ..database import SessionLocal
-from ..models import Order
-from ..schemas import OrderCreate, OrderResponse
-from typing import List, Optional
-from pydantic import BaseModel
-import logging
+from sqlalchemy import (delete, desc, insert, select, tuple_, union_all,
+                        update)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm.exc import StaleDataError
+from ..database import DbSession, get_db, run_db
+from ..replicas import get_read_db
+from ..models import ArchivedOrder, Order
+from ..archive import archive_watermark, fetch_archived_order, includes_archive
+from ..change_tokens import ORDERS_TOKEN, bump_token, current_token
+from ..counts import TOTAL_MODE_EXACT, order_counts, order_total
+from ..filters import (apply_order_filters, filters_key,
+                       parse_order_filters)
+from ..http_cache import REVALIDATE, etag_matches, list_etag, order_list_cache
+from ..events import (EVENT_BULK, EVENT_CREATED, EVENT_DELETED,
+                      EVENT_RESET, EVENT_UPDATED, ORDER_EVENTS_KEEPALIVE,
+                      format_sse, order_event, order_events)
+from ..explain import explain_order_filters
+from ..export import EXPORT_MEDIA_TYPES, export_orders
+from ..log import log_request
+from ..partitions import ORDER_PARTITIONS, pruning_bound
+from ..references import reference_errors
+from ..pagination import (CURSOR_NEXT, CURSOR_PREV, InvalidCursorError,
+                          decode_cursor, encode_cursor)
+from ..rollups import (add_to_rollups, move_in_rollups, order_values,
+                       refresh_rollups, remove_from_rollups)
+from ..stats import INTERVALS, order_stats, parse_group_by
+from ..serialization import (ORDER_COLUMNS, ORDER_FIELDS, order_page_response,
+                             order_to_dict)
+from ..schemas import OrderCreate, OrderResponse, OrderUpdate
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from pydantic import BaseModel, Field, ValidationError
 from datetime import datetime
+import asyncio
+import json
+import logging
+import os
+import time
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Expose diagnostic endpoints such as /orders/explain
+DEBUG_ENDPOINTS = os.getenv(
+    "ENABLE_DEBUG_ENDPOINTS",
+    "false").lower() == "true"
+
+# Rows per multi-row INSERT in the bulk import
+IMPORT_BATCH_SIZE = int(os.getenv("ORDER_IMPORT_BATCH_SIZE", "1000"))
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson")
+
+# Upper bound for the ID list of the batch endpoints, one IN (...) each
+BATCH_MAX_IDS = int(os.getenv("ORDER_BATCH_MAX_IDS", "1000"))
+
+BATCH_UPDATED = "updated"
+BATCH_DELETED = "deleted"
+BATCH_NOT_FOUND = "not_found"
+
 router = APIRouter(
     prefix="/orders",
     tags=["orders"]
 )
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 class PaginatedResponse(BaseModel):
     items: List[OrderResponse]
-    total: int
-    page: int
+    total: Optional[int]
+    page: Optional[int]
     per_page: int
-    total_pages: int
+    total_pages: Optional[int]
+    total_mode: str = TOTAL_MODE_EXACT
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+def _prune_older(db: Session, filters: dict, rows_needed: int,
+                 watermark: Optional[datetime],
+                 before: Optional[datetime] = None) -> Optional[datetime]:
+    # Newest-first pages only read recent months. An explicit created_at
+    # bound lets a partitioned table skip all older partitions.
+    if not ORDER_PARTITIONS:
+        return None
+    return pruning_bound(db, filters, rows_needed, before, after=watermark)
+
+
+def _page_rows(db: Session, filters: dict, models: list, clauses=None,
+               ascending: bool = False, offset: int = 0,
+               limit: int = 20) -> list:
+    """One page of order rows, newest first unless ascending.
+
+    clauses(model) returns extra filter clauses for a tier. With the
+    archive, every tier returns its own first offset + limit rows and the
+    page is cut from their merge.
+    """
+    def tier_query(model):
+        # Plain column tuples are much cheaper to build and serialize
+        # than ORM objects
+        columns = [getattr(model, field) for field in ORDER_FIELDS]
+        query = apply_order_filters(db.query(*columns), filters, model)
+        if clauses is not None:
+            query = query.filter(*clauses(model))
+        key = [model.created_at, model.id]
+        return query.order_by(*(key if ascending else map(desc, key)))
+
+    if len(models) == 1:
+        return tier_query(models[0]).offset(offset).limit(limit).all()
+
+    tiers = union_all(*(
+        select(tier_query(model).limit(offset + limit).subquery())
+        for model in models
+    )).subquery()
+    key = [tiers.c.created_at, tiers.c.id]
+    return db.execute(
+        select(*(tiers.c[field] for field in ORDER_FIELDS))
+        .order_by(*(key if ascending else map(desc, key)))
+        .offset(offset)
+        .limit(limit)
+    ).all()
+
+
+def list_orders(
+    db: Session,
+    filters: dict,
+    page: int = 1,
+    per_page: int = 20,
+    cursor_mode: bool = False,
+    cursor: Optional[str] = None,
+    total_mode: str = TOTAL_MODE_EXACT
+) -> dict:
+    # Live orders only, unless the date filter reaches into the archive
+    watermark = archive_watermark(db)
+    models = [Order, ArchivedOrder] if includes_archive(
+        filters, watermark) else [Order]
+    # The whole archive is read, the rollups count the same rows
+    live_after = watermark if len(models) == 1 else None
+
+    # Get total count, possibly estimated or cached
+    total = order_total(db, filters, total_mode,
+                        include_archive=len(models) > 1)
+
+    # Calculate total pages
+    total_pages = None
+    if total is not None:
+        total_pages = (total + per_page - 1) // per_page
+
+    if cursor_mode or cursor:
+        # Keyset pagination - seek on (created_at, id) instead of OFFSET
+        cursor_key = None
+        cursor_created_at = None
+        direction = CURSOR_NEXT
+        if cursor:
+            try:
+                cursor_created_at, cursor_id, direction = decode_cursor(cursor)
+            except InvalidCursorError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            cursor_key = tuple_(cursor_created_at, cursor_id)
+
+        bound = None
+        if direction == CURSOR_NEXT:
+            bound = _prune_older(db, filters, per_page + 1, live_after,
+                                 cursor_created_at)
+
+        def seek(model):
+            row_key = tuple_(model.created_at, model.id)
+            clauses = []
+            if bound is not None:
+                clauses.append(model.created_at >= bound)
+            if direction == CURSOR_PREV:
+                # Walk backwards in ascending order, then flip the page
+                clauses += [model.created_at >= cursor_created_at,
+                            row_key > cursor_key]
+            elif cursor_key is not None:
+                # The plain created_at bound keeps this a range scan
+                clauses += [model.created_at <= cursor_created_at,
+                            row_key < cursor_key]
+            return clauses
+
+        # Fetch one extra row to know whether another page exists
+        orders = _page_rows(db, filters, models, seek,
+                            ascending=direction == CURSOR_PREV,
+                            limit=per_page + 1)
+        has_more = len(orders) > per_page
+        orders = orders[:per_page]
+        if direction == CURSOR_PREV:
+            orders.reverse()
+
+        next_cursor = None
+        prev_cursor = None
+        if orders:
+            if has_more or direction == CURSOR_PREV:
+                last = orders[-1]
+                next_cursor = encode_cursor(
+                    last.created_at, last.id, CURSOR_NEXT)
+            if (has_more and direction == CURSOR_PREV) or (
+                    direction == CURSOR_NEXT and cursor_key is not None):
+                first = orders[0]
+                prev_cursor = encode_cursor(
+                    first.created_at, first.id, CURSOR_PREV)
+
+        return {
+            "items": orders,
+            "total": total,
+            "page": None,
+            "per_page": per_page,
+            "total_pages": total_pages,
+            "total_mode": total_mode,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor
+        }
+
+    # Apply pagination
+    bound = _prune_older(db, filters, page * per_page, live_after)
+    orders = _page_rows(
+        db, filters, models,
+        (lambda model: [model.created_at >= bound]) if bound else None,
+        offset=(page - 1) * per_page, limit=per_page)
+
+    return {
+        "items": orders,
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "total_pages": total_pages,
+        "total_mode": total_mode,
+        "next_cursor": None,
+        "prev_cursor": None
+    }
+
+
+class BulkImportError(BaseModel):
+    index: int
+    errors: List[Any]
+
+
+class BulkImportResponse(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: List[BulkImportError]
+
+
+class OrderIds(BaseModel):
+    ids: List[int] = Field(..., min_items=1, max_items=BATCH_MAX_IDS)
+
+
+class BatchUpdateRequest(OrderIds):
+    changes: OrderUpdate
+
+
+class BatchGetResponse(BaseModel):
+    items: List[OrderResponse]
+    missing: List[int]
+
+
+class BatchResult(BaseModel):
+    id: int
+    status: str
+
+
+class BatchWriteResponse(BaseModel):
+    results: List[BatchResult]
+
+
+def list_cache_key(filters: dict, page: int, per_page: int, pagination: str,
+                   cursor: Optional[str], total_mode: str) -> tuple:
+    # Everything that shapes a list page, for its ETag and cached body
+    return (filters_key(filters), page, per_page, pagination, cursor,
+            total_mode)
 
 
 @router.get("", response_model=PaginatedResponse)
-def get_orders(
+async def get_orders(
+    request: Request,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
@@ -45,152 +284,654 @@ def get_orders(
     date_to: Optional[str] = None,
     price_from: Optional[str] = None,
     price_to: Optional[str] = None,
-    db: Session = Depends(get_db)
+    pagination: str = Query("page", regex="^(page|cursor)$"),
+    cursor: Optional[str] = None,
+    total_mode: str = Query(
+        TOTAL_MODE_EXACT, regex="^(exact|estimate|none)$"),
+    db: DbSession = Depends(get_read_db)
+):
+    started = time.perf_counter()
+    filters = parse_order_filters(
+        search, status, category, date_from, date_to, price_from, price_to)
+
+    # Polling clients mostly ask for pages that did not change. One token
+    # lookup answers those without the count and page queries.
+    params = list_cache_key(filters, page, per_page, pagination, cursor,
+                            total_mode)
+    token = await run_db(db, current_token, ORDERS_TOKEN)
+    headers = {"Cache-Control": REVALIDATE}
+    if token is not None:
+        headers["ETag"] = list_etag(token, params)
+        if etag_matches(request.headers.get("if-none-match"),
+                        headers["ETag"]):
+            log_request("orders.list", started, filters=filters,
+                        cache="not_modified")
+            return Response(status_code=304, headers=headers)
+        body = order_list_cache.get((token, params))
+        if body is not None:
+            log_request("orders.list", started, filters=filters, cache="hit")
+            return Response(content=body, media_type="application/json",
+                            headers=headers)
+
+    result = await run_db(
+        db, list_orders, filters,
+        page=page,
+        per_page=per_page,
+        cursor_mode=pagination == "cursor",
+        cursor=cursor,
+        total_mode=total_mode
+    )
+
+    # One summary record per request instead of a line per row
+    log_request(
+        "orders.list", started,
+        filters=filters,
+        page=result["page"],
+        per_page=per_page,
+        pagination=pagination,
+        total_mode=total_mode,
+        total=result["total"],
+        rows=len(result["items"])
+    )
+    # The rows already have the response shape, no need to validate them
+    # through PaginatedResponse again
+    response = order_page_response(result, headers=headers)
+    if token is not None:
+        order_list_cache.set((token, params), response.body)
+    return response
+
+
+@router.get("/export")
+async def export_orders_stream(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    price_from: Optional[str] = None,
+    price_to: Optional[str] = None,
+    db: DbSession = Depends(get_read_db)
 ):
-    logger.info(f"Fetching orders - page: {page}, per_page: {per_page}")
-    logger.info(
-        f"Filters - date_from: {date_from}, date_to: {date_to}, price_from: {price_from}, price_to: {price_to}")
+    filters = parse_order_filters(
+        search, status, category, date_from, date_to, price_from, price_to)
+    logger.debug("Exporting orders as %s", format)
+    return StreamingResponse(
+        export_orders(db, filters, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="orders.{format}"'
+        }
+    )
+
+
+@router.get("/explain")
+async def explain_orders(
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    price_from: Optional[str] = None,
+    price_to: Optional[str] = None,
+    db: DbSession = Depends(get_db)
+):
+    if not DEBUG_ENDPOINTS:
+        raise HTTPException(status_code=404, detail="Not Found")
 
-    # Build query
-    query = db.query(Order)
+    filters = parse_order_filters(
+        search, status, category, date_from, date_to, price_from, price_to)
+    return await run_db(db, explain_order_filters, filters)
 
-    # Apply filters
-    if search and search.strip():
-        query = query.filter(Order.brand.ilike(f"%{search.strip()}%"))
 
-    if status and status.strip():
-        try:
-            status_id = int(status)
-            query = query.filter(Order.status_id == status_id)
-        except ValueError:
-            logger.warning(f"Invalid status ID format: {status}")
+@router.get("/stats")
+async def get_order_stats(
+    group_by: Optional[str] = None,
+    interval: Optional[str] = Query(
+        None, regex="^(" + "|".join(INTERVALS) + ")$"),
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    price_from: Optional[str] = None,
+    price_to: Optional[str] = None,
+    db: DbSession = Depends(get_read_db)
+):
+    started = time.perf_counter()
+    try:
+        groups = parse_group_by(group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filters = parse_order_filters(
+        search, status, category, date_from, date_to, price_from, price_to)
+    result = await run_db(db, order_stats, filters, groups, interval)
+
+    log_request(
+        "orders.stats", started,
+        filters=filters,
+        group_by=groups,
+        interval=interval,
+        source=result["source"]
+    )
+    return result
+
+
+@router.get("/events")
+async def order_event_stream(
+    request: Request,
+    status: Optional[str] = None,
+    category: Optional[str] = None
+):
+    """Server-Sent Events feed of order changes.
 
-    if category and category.strip():
-        try:
-            category_id = int(category)
-            query = query.filter(Order.vehicle_category_id == category_id)
-        except ValueError:
-            logger.warning(f"Invalid category ID format: {category}")
+    Events: order.created, order.updated and order.deleted with the order,
+    orders.changed after a bulk import, and reset when the client fell
+    behind and should refetch before reconnecting.
+    """
+    filters = parse_order_filters(status=status, category=category)
+    subscription = order_events.subscribe(
+        filters.get("status_id"), filters.get("category_id"))
 
-    if date_from and date_from.strip():
+    async def stream():
         try:
-            # Try parsing with time first
-            date_from_dt = datetime.fromisoformat(date_from)
-        except ValueError:
-            try:
-                # If that fails, try parsing just the date
-                date_from_dt = datetime.strptime(date_from, '%Y-%m-%d')
-            except ValueError:
-                logger.warning(f"Invalid date_from format: {date_from}")
-            else:
-                query = query.filter(Order.created_at >= date_from_dt)
-        else:
-            query = query.filter(Order.created_at >= date_from_dt)
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event_type, data = await asyncio.wait_for(
+                        subscription.get(), ORDER_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event_type, data)
+                if event_type == EVENT_RESET:
+                    break
+        finally:
+            order_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def check_references(db: Session, values: dict):
+    # The orders table may have no foreign keys, see app.references
+    errors = reference_errors(db, [values])[0]
+    if errors:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="; ".join(errors))
+
+
+def _create_order(db: Session, order: OrderCreate) -> Order:
+    check_references(db, order.dict())
+    db_order = Order(**order.dict())
+    db.add(db_order)
+    db.flush()
+    add_to_rollups(db, [order_values(db_order)])
+    bump_token(db, ORDERS_TOKEN)
+    db.commit()
+    order_counts.invalidate()
+    db.refresh(db_order)
+    order_events.publish(order_event(EVENT_CREATED, order_to_dict(db_order)))
+    return db_order
+
 
-    if date_to and date_to.strip():
+@router.post("", response_model=OrderResponse)
+async def create_order(order: OrderCreate, db: DbSession = Depends(get_db)):
+    return await run_db(db, _create_order, order)
+
+
+async def _iter_import_records(
+        request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (index, record) pairs from a JSON array or NDJSON body.
+
+    Records that are not valid JSON are yielded as ValueError instances so
+    they are reported with their index instead of aborting the import.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.split(";")[0].strip() not in NDJSON_MEDIA_TYPES:
         try:
-            # Try parsing with time first
-            date_to_dt = datetime.fromisoformat(date_to)
+            records = json.loads(await request.body())
         except ValueError:
-            try:
-                # If that fails, try parsing just the date
-                date_to_dt = datetime.strptime(date_to, '%Y-%m-%d')
-            except ValueError:
-                logger.warning(f"Invalid date_to format: {date_to}")
-            else:
-                # Add end of day time (23:59:59) to include the entire day
-                date_to_dt = date_to_dt.replace(hour=23, minute=59, second=59)
-                query = query.filter(Order.created_at <= date_to_dt)
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(records, list):
+            raise HTTPException(status_code=400,
+                                detail="Expected a JSON array of orders")
+        for index, record in enumerate(records):
+            yield index, record
+        return
+
+    # NDJSON is parsed while it streams in, one line per order
+    index = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, _parse_ndjson_line(line)
+                index += 1
+    if buffer.strip():
+        yield index, _parse_ndjson_line(buffer)
+
+
+def _parse_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
+
+
+def _validate_import_record(record) -> OrderCreate:
+    if isinstance(record, ValueError):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("Expected a JSON object")
+    return OrderCreate.parse_obj(record)
+
+
+def _insert_order_batch(db: Session, batch: list) -> Tuple[int, list]:
+    """Insert (index, values) rows with one multi-row INSERT.
+
+    If the batch is rejected, the rows are retried one by one inside
+    savepoints so a single bad row only fails itself.
+    """
+    # Rows with unknown lookup ids fail on their own
+    errors = []
+    valid = []
+    row_errors = reference_errors(db, [values for _, values in batch])
+    for (index, values), messages in zip(batch, row_errors):
+        if messages:
+            errors.append({"index": index, "errors": messages})
         else:
-            query = query.filter(Order.created_at <= date_to_dt)
-
-    if price_from and price_from.strip():
+            valid.append((index, values))
+    batch = valid
+    if not batch:
+        db.rollback()
+        return 0, errors
+
+    statement = insert(Order.__table__)
+    # Set here rather than by the column default, the rollups need it
+    created_at = datetime.utcnow()
+    rows = [{**values, "created_at": created_at} for _, values in batch]
+    try:
+        db.execute(statement, rows)
+        add_to_rollups(db, rows)
+        bump_token(db, ORDERS_TOKEN)
+        db.commit()
+        order_events.publish({"type": EVENT_BULK, "count": len(rows)})
+        return len(batch), errors
+    except DBAPIError:
+        db.rollback()
+
+    inserted = []
+    for (index, _), values in zip(batch, rows):
         try:
-            # Try to convert to float, handling both comma and dot decimal
-            # separators
-            price_from_val = float(price_from.replace(',', '.'))
-            query = query.filter(Order.price >= price_from_val)
-            logger.info(f"Applied price_from filter: {price_from_val}")
-        except ValueError:
-            logger.warning(f"Invalid price_from format: {price_from}")
+            with db.begin_nested():
+                db.execute(statement, values)
+            inserted.append(values)
+        except DBAPIError as e:
+            errors.append({"index": index, "errors": [str(e.orig)]})
+    if inserted:
+        add_to_rollups(db, inserted)
+        bump_token(db, ORDERS_TOKEN)
+    db.commit()
+    if inserted:
+        order_events.publish({"type": EVENT_BULK, "count": len(inserted)})
+    return len(inserted), errors
 
-    if price_to and price_to.strip():
-        try:
-            # Try to convert to float, handling both comma and dot decimal
-            # separators
-            price_to_val = float(price_to.replace(',', '.'))
-            query = query.filter(Order.price <= price_to_val)
-            logger.info(f"Applied price_to filter: {price_to_val}")
-        except ValueError:
-            logger.warning(f"Invalid price_to format: {price_to}")
 
-    # Get total count
-    total = query.count()
-    logger.info(f"Total orders in database: {total}")
+@router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_create_orders(
+    request: Request,
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=10000),
+    db: DbSession = Depends(get_db)
+):
+    started = time.perf_counter()
+    received = 0
+    inserted = 0
+    errors = []
+    batch = []
+
+    async def flush():
+        nonlocal inserted, batch
+        batch_inserted, batch_errors = await run_db(
+            db, _insert_order_batch, batch)
+        inserted += batch_inserted
+        errors.extend(batch_errors)
+        batch = []
 
-    # Calculate total pages
-    total_pages = (total + per_page - 1) // per_page
-    logger.info(f"Total pages: {total_pages}")
+    try:
+        async for index, record in _iter_import_records(request):
+            received += 1
+            try:
+                order = _validate_import_record(record)
+            except ValidationError as e:
+                errors.append({"index": index, "errors": e.errors()})
+                continue
+            except ValueError as e:
+                errors.append({"index": index, "errors": [str(e)]})
+                continue
+
+            batch.append((index, order.dict()))
+            if len(batch) >= batch_size:
+                await flush()
+
+        if batch:
+            await flush()
+    finally:
+        if inserted:
+            order_counts.invalidate()
+
+    log_request(
+        "orders.bulk", started,
+        received=received,
+        inserted=inserted,
+        failed=len(errors),
+        batch_size=batch_size
+    )
+    errors.sort(key=lambda error: error["index"])
+    return {
+        "received": received,
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": errors
+    }
 
-    # Apply pagination
-    query = query.order_by(desc(Order.created_at))
-    query = query.offset((page - 1) * per_page).limit(per_page)
 
-    # Execute query
-    orders = query.all()
-    logger.info(f"Retrieved {len(orders)} orders")
+def _unique_ids(ids: List[int]) -> List[int]:
+    return list(dict.fromkeys(ids))
 
-    # Log each order for debugging
-    for order in orders:
-        logger.info(
-            f"Order: id={order.id}, brand={order.brand}, category_id={order.vehicle_category_id}, status_id={order.status_id}")
 
+def _batch_get_orders(db: Session, ids: List[int]) -> dict:
+    ids = _unique_ids(ids)
+    found = {order.id: order
+             for order in db.query(Order).filter(Order.id.in_(ids))}
     return {
-        "items": orders,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "total_pages": total_pages
+        "items": [found[order_id] for order_id in ids if order_id in found],
+        "missing": [order_id for order_id in ids if order_id not in found]
     }
 
 
-@router.post("", response_model=OrderResponse)
-def create_order(order: OrderCreate, db: Session = Depends(get_db)):
-    db_order = Order(**order.dict())
-    db.add(db_order)
+def _lock_batch_rows(db: Session, ids: List[int]) -> List[dict]:
+    # Lock in id order so concurrent batches cannot deadlock each other
+    rows = db.execute(
+        select(*ORDER_COLUMNS)
+        .where(Order.id.in_(ids))
+        .order_by(Order.id)
+        .with_for_update()
+    )
+    return [dict(row._mapping) for row in rows]
+
+
+def _batch_results(ids: List[int], found: set, outcome: str) -> dict:
+    return {"results": [
+        {"id": order_id,
+         "status": outcome if order_id in found else BATCH_NOT_FOUND}
+        for order_id in ids
+    ]}
+
+
+def _batch_update_orders(db: Session, ids: List[int], changes: dict) -> dict:
+    """Apply the same partial update to all ids with one UPDATE ... IN."""
+    ids = _unique_ids(ids)
+    if changes:
+        check_references(db, changes)
+    old_rows = _lock_batch_rows(db, ids)
+    found = [row["id"] for row in old_rows]
+    if found and changes:
+        try:
+            db.execute(
+                update(Order)
+                .where(Order.id.in_(found))
+                .values(**changes, version=Order.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+        except DBAPIError as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=str(e.orig))
+        refresh_rollups(
+            db, old_rows + [{**row, **changes} for row in old_rows])
+        bump_token(db, ORDERS_TOKEN)
     db.commit()
-    db.refresh(db_order)
-    return db_order
+    if found and changes:
+        order_counts.invalidate()
+        for row in old_rows:
+            new_row = {**row, **changes, "version": row["version"] + 1}
+            order_events.publish(
+                order_event(EVENT_UPDATED, new_row, previous=row))
+    return _batch_results(ids, set(found), BATCH_UPDATED)
+
+
+def _batch_delete_orders(db: Session, ids: List[int]) -> dict:
+    """Delete all ids with one DELETE ... IN."""
+    ids = _unique_ids(ids)
+    old_rows = _lock_batch_rows(db, ids)
+    found = [row["id"] for row in old_rows]
+    if found:
+        db.execute(
+            delete(Order)
+            .where(Order.id.in_(found))
+            .execution_options(synchronize_session=False)
+        )
+        refresh_rollups(db, old_rows)
+        bump_token(db, ORDERS_TOKEN)
+    db.commit()
+    if found:
+        order_counts.invalidate()
+        for row in old_rows:
+            order_events.publish(order_event(EVENT_DELETED, row))
+    return _batch_results(ids, set(found), BATCH_DELETED)
 
 
-@router.get("/{order_id}", response_model=OrderResponse)
-def get_order(order_id: int, db: Session = Depends(get_db)):
+@router.post("/batch/get", response_model=BatchGetResponse)
+async def batch_get_orders(request: OrderIds,
+                           db: DbSession = Depends(get_read_db)):
+    return await run_db(db, _batch_get_orders, request.ids)
+
+
+@router.post("/batch/update", response_model=BatchWriteResponse)
+async def batch_update_orders(request: BatchUpdateRequest,
+                              db: DbSession = Depends(get_db)):
+    started = time.perf_counter()
+    changes = request.changes.dict(exclude_unset=True)
+    result = await run_db(db, _batch_update_orders, request.ids, changes)
+    log_request("orders.batch_update", started,
+                ids=len(request.ids), fields=sorted(changes))
+    return result
+
+
+@router.post("/batch/delete", response_model=BatchWriteResponse)
+async def batch_delete_orders(request: OrderIds,
+                              db: DbSession = Depends(get_db)):
+    started = time.perf_counter()
+    result = await run_db(db, _batch_delete_orders, request.ids)
+    log_request("orders.batch_delete", started, ids=len(request.ids))
+    return result
+
+
+def order_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def _if_match_versions(if_match: Optional[str]) -> Optional[set]:
+    """Order versions accepted by an If-Match header, None for any."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = set()
+    for tag in if_match.split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag.isdigit():
+            versions.add(int(tag))
+    return versions
+
+
+def _precondition_failed(version: int):
+    raise HTTPException(
+        status_code=412,
+        detail="Order was modified, current version is %d" % version,
+        headers={"ETag": order_etag(version)}
+    )
+
+
+def fetch_order(db: Session, order_id: int) -> Order:
     order = db.query(Order).filter(Order.id == order_id).first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
 
-@router.put("/{order_id}", response_model=OrderResponse)
-def update_order(order_id: int, order: OrderCreate,
-                 db: Session = Depends(get_db)):
-    db_order = db.query(Order).filter(Order.id == order_id).first()
-    if not db_order:
+def read_order(db: Session, order_id: int) -> dict:
+    """A live order, or an archived one, which is read-only."""
+    order = db.query(Order).filter(Order.id == order_id).first()
+    if order is not None:
+        return order_to_dict(order)
+    archived = fetch_archived_order(db, order_id)
+    if archived is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    return archived
+
+
+def _order_version(db: Session, order_id: int) -> int:
+    version = db.execute(
+        select(Order.version).where(Order.id == order_id)).scalar()
+    if version is None:
+        version = db.execute(select(ArchivedOrder.version)
+                             .where(ArchivedOrder.id == order_id)).scalar()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return version
+
+
+@router.get("/{order_id}", response_model=OrderResponse)
+async def get_order(order_id: int, request: Request, response: Response,
+                    db: DbSession = Depends(get_read_db)):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # The version alone decides whether the client copy is current
+        etag = order_etag(await run_db(db, _order_version, order_id))
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={
+                "ETag": etag, "Cache-Control": REVALIDATE})
+
+    order = await run_db(db, read_order, order_id)
+    response.headers["ETag"] = order_etag(order["version"])
+    response.headers["Cache-Control"] = REVALIDATE
+    return order
+
+
+def _update_order(db: Session, order_id: int, order: OrderCreate,
+                  versions: Optional[set] = None) -> Order:
+    db_order = fetch_order(db, order_id)
+    if versions is not None and db_order.version not in versions:
+        _precondition_failed(db_order.version)
+    check_references(db, order.dict())
+    old_values = order_values(db_order)
 
     for key, value in order.dict().items():
         setattr(db_order, key, value)
 
+    try:
+        # The flush checks and bumps the version column
+        db.flush()
+    except StaleDataError:
+        db.rollback()
+        _precondition_failed(fetch_order(db, order_id).version)
+    move_in_rollups(db, old_values, order_values(db_order))
+    bump_token(db, ORDERS_TOKEN)
     db.commit()
+    order_counts.invalidate()
     db.refresh(db_order)
+    order_events.publish(order_event(
+        EVENT_UPDATED, order_to_dict(db_order), previous=old_values))
     return db_order
 
 
-@router.delete("/{order_id}")
-def delete_order(order_id: int, db: Session = Depends(get_db)):
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
+@router.put("/{order_id}", response_model=OrderResponse)
+async def update_order(order_id: int, order: OrderCreate, response: Response,
+                       if_match: Optional[str] = Header(None),
+                       db: DbSession = Depends(get_db)):
+    db_order = await run_db(db, _update_order, order_id, order,
+                            _if_match_versions(if_match))
+    response.headers["ETag"] = order_etag(db_order.version)
+    return db_order
+
+
+def _patch_order(db: Session, order_id: int, changes: dict,
+                 versions: Optional[set] = None) -> dict:
+    """Partial update: one locking primary-key read and one UPDATE.
+
+    The response is built from the row read and the changes, no reload.
+    """
+    row = db.execute(
+        select(Order.__table__)
+        .where(Order.id == order_id)
+        .with_for_update()
+    ).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    old_row = dict(row._mapping)
+    if versions is not None and old_row["version"] not in versions:
+        _precondition_failed(old_row["version"])
+    if not changes:
+        return old_row
+    check_references(db, changes)
+
+    try:
+        result = db.execute(
+            update(Order)
+            .where(Order.id == order_id, Order.version == old_row["version"])
+            .values(**changes, version=Order.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+    except DBAPIError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e.orig))
+    if result.rowcount == 0:
+        # Only possible without row locks, e.g. on SQLite
+        db.rollback()
+        _precondition_failed(fetch_order(db, order_id).version)
+
+    new_row = {**old_row, **changes, "version": old_row["version"] + 1}
+    move_in_rollups(db, order_values(old_row), order_values(new_row))
+    bump_token(db, ORDERS_TOKEN)
+    db.commit()
+    order_counts.invalidate()
+    order_events.publish(order_event(
+        EVENT_UPDATED, order_to_dict(new_row), previous=old_row))
+    return new_row
+
+
+@router.patch("/{order_id}", response_model=OrderResponse)
+async def patch_order(order_id: int, changes: OrderUpdate, response: Response,
+                      if_match: Optional[str] = Header(None),
+                      db: DbSession = Depends(get_db)):
+    row = await run_db(db, _patch_order, order_id,
+                       changes.dict(exclude_unset=True),
+                       _if_match_versions(if_match))
+    response.headers["ETag"] = order_etag(row["version"])
+    return row
+
+
+def _delete_order(db: Session, order_id: int):
+    order = fetch_order(db, order_id)
+    values = order_values(order)
+    deleted = order_to_dict(order)
     db.delete(order)
+    db.flush()
+    remove_from_rollups(db, [values])
+    bump_token(db, ORDERS_TOKEN)
     db.commit()
+    order_counts.invalidate()
+    order_events.publish(order_event(EVENT_DELETED, deleted))
+
+
+@router.delete("/{order_id}")
+async def delete_order(order_id: int, db: DbSession = Depends(get_db)):
+    await run_db(db, _delete_order, order_id)
     return {"message": "Order deleted successfully"}
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlalchemy.orm import Session
-from ..database import SessionLocal
+from ..database import DbSession, get_db, run_db
+from ..replicas import get_read_db
+from ..lookup_cache import lookup_cache, lookup_response
 from ..models import OrderStatus
+from ..references import lookup_in_use
 from pydantic import BaseModel
 from typing import Dict
 from fastapi.responses import JSONResponse
@@ -13,14 +16,6 @@ router = APIRouter(
 )
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 class StatusCreate(BaseModel):
     status: str
 
@@ -33,38 +28,61 @@ class StatusResponse(BaseModel):
         from_attributes = True
 
 
-@router.get("", response_model=Dict[str, str])
-def get_statuses(db: Session = Depends(get_db)):
+def _get_statuses(db: Session) -> Dict[str, str]:
     statuses = db.query(OrderStatus).all()
-    status_dict = {str(status.id): status.status for status in statuses}
-    return JSONResponse(content=jsonable_encoder(status_dict))
+    return {str(status.id): status.status for status in statuses}
 
 
-@router.post("", response_model=StatusResponse)
-def create_status(status: StatusCreate, db: Session = Depends(get_db)):
+@router.get("", response_model=Dict[str, str])
+async def get_statuses(request: Request, db: DbSession = Depends(get_read_db)):
+    # Served from memory, the session only connects on a cache miss
+    entry = await lookup_cache.fetch("statuses", db, _get_statuses)
+    return lookup_response(request, entry)
+
+
+def _create_status(db: Session, status: StatusCreate) -> OrderStatus:
     try:
         new_status = OrderStatus(status=status.status)
         db.add(new_status)
         db.commit()
+        lookup_cache.invalidate()
         db.refresh(new_status)
-        return JSONResponse(content=jsonable_encoder(new_status))
+        return new_status
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400,
                             detail="Status with this name already exists")
 
 
-@router.delete("/{status_id}")
-def delete_status(status_id: int, db: Session = Depends(get_db)):
-    status = db.query(OrderStatus).filter(OrderStatus.id == status_id).first()
+@router.post("", response_model=StatusResponse)
+async def create_status(status: StatusCreate,
+                        db: DbSession = Depends(get_db)):
+    new_status = await run_db(db, _create_status, status)
+    return JSONResponse(content=jsonable_encoder(new_status))
+
+
+def _delete_status(db: Session, status_id: int):
+    status = db.query(OrderStatus).filter(
+        OrderStatus.id == status_id).with_for_update().first()
     if not status:
         raise HTTPException(status_code=404, detail="Status not found")
+    # Orders may have no foreign key to catch this, see app.references
+    if lookup_in_use(db, "status_id", status_id):
+        db.rollback()
+        raise HTTPException(status_code=400,
+                            detail="Cannot delete status that is in use")
 
     try:
         db.delete(status)
         db.commit()
-        return {"message": "Status deleted successfully"}
+        lookup_cache.invalidate()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400,
                             detail="Cannot delete status that is in use")
+
+
+@router.delete("/{status_id}")
+async def delete_status(status_id: int, db: DbSession = Depends(get_db)):
+    await run_db(db, _delete_status, status_id)
+    return {"message": "Status deleted successfully"}
@@ -1,8 +1,11 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from ..database import get_db
-from ..models import VehicleCategory, Order
+from ..database import DbSession, get_db, run_db
+from ..replicas import get_read_db
+from ..lookup_cache import lookup_cache, lookup_response
+from ..models import VehicleCategory
+from ..references import lookup_in_use
 from ..schemas import VehicleCategoryCreate, VehicleCategoryResponse
 from typing import List
 
@@ -12,19 +15,27 @@ router = APIRouter(
 )
 
 
+def _get_vehicle_categories(db: Session) -> List[dict]:
+    return [VehicleCategoryResponse.from_orm(category).dict()
+            for category in db.query(VehicleCategory).all()]
+
+
 @router.get("/", response_model=List[VehicleCategoryResponse])
-def get_vehicle_categories(db: Session = Depends(get_db)):
-    categories = db.query(VehicleCategory).all()
-    return categories
+async def get_vehicle_categories(
+        request: Request, db: DbSession = Depends(get_read_db)):
+    # Served from memory, the session only connects on a cache miss
+    entry = await lookup_cache.fetch(
+        "vehicle_categories", db, _get_vehicle_categories)
+    return lookup_response(request, entry)
 
 
-@router.post("/", response_model=VehicleCategoryResponse)
-def create_vehicle_category(
-        category: VehicleCategoryCreate, db: Session = Depends(get_db)):
+def _create_vehicle_category(
+        db: Session, category: VehicleCategoryCreate) -> VehicleCategory:
     try:
         db_category = VehicleCategory(name=category.name)
         db.add(db_category)
         db.commit()
+        lookup_cache.invalidate()
         db.refresh(db_category)
         return db_category
     except IntegrityError:
@@ -35,11 +46,19 @@ def create_vehicle_category(
         )
 
 
-@router.get("/{category_id}",
-            response_model=VehicleCategoryResponse)
-def get_vehicle_category(category_id: int, db: Session = Depends(get_db)):
-    category = db.query(VehicleCategory).filter(
-        VehicleCategory.id == category_id).first()
+@router.post("/", response_model=VehicleCategoryResponse)
+async def create_vehicle_category(
+        category: VehicleCategoryCreate, db: DbSession = Depends(get_db)):
+    return await run_db(db, _create_vehicle_category, category)
+
+
+def _fetch_vehicle_category(db: Session, category_id: int,
+                            lock: bool = False) -> VehicleCategory:
+    query = db.query(VehicleCategory).filter(
+        VehicleCategory.id == category_id)
+    if lock:
+        query = query.with_for_update()
+    category = query.first()
     if not category:
         raise HTTPException(
             status_code=404,
@@ -47,40 +66,48 @@ def get_vehicle_category(category_id: int, db: Session = Depends(get_db)):
     return category
 
 
-@router.put("/{category_id}",
+@router.get("/{category_id}",
             response_model=VehicleCategoryResponse)
-def update_vehicle_category(
-        category_id: int, category: VehicleCategoryCreate, db: Session = Depends(get_db)):
-    db_category = db.query(VehicleCategory).filter(
-        VehicleCategory.id == category_id).first()
-    if not db_category:
-        raise HTTPException(
-            status_code=404,
-            detail="Vehicle category not found")
+async def get_vehicle_category(
+        category_id: int, db: DbSession = Depends(get_db)):
+    return await run_db(db, _fetch_vehicle_category, category_id)
+
 
+def _update_vehicle_category(
+        db: Session, category_id: int,
+        category: VehicleCategoryCreate) -> VehicleCategory:
+    db_category = _fetch_vehicle_category(db, category_id)
     db_category.name = category.name
     db.commit()
+    lookup_cache.invalidate()
     db.refresh(db_category)
     return db_category
 
 
-@router.delete("/{category_id}")
-def delete_vehicle_category(category_id: int, db: Session = Depends(get_db)):
-    category = db.query(VehicleCategory).filter(
-        VehicleCategory.id == category_id).first()
-    if not category:
-        raise HTTPException(
-            status_code=404,
-            detail="Vehicle category not found")
+@router.put("/{category_id}",
+            response_model=VehicleCategoryResponse)
+async def update_vehicle_category(
+        category_id: int, category: VehicleCategoryCreate, db: DbSession = Depends(get_db)):
+    return await run_db(db, _update_vehicle_category, category_id, category)
 
-    # Check if category is in use
-    orders_using_category = db.query(Order).filter(
-        Order.vehicle_category_id == category_id).first()
-    if orders_using_category:
+
+def _delete_vehicle_category(db: Session, category_id: int):
+    category = _fetch_vehicle_category(db, category_id, lock=True)
+
+    # Check if category is in use, by live or archived orders
+    if lookup_in_use(db, "vehicle_category_id", category_id):
+        db.rollback()
         raise HTTPException(
             status_code=400,
             detail="Cannot delete category that is in use")
 
     db.delete(category)
     db.commit()
+    lookup_cache.invalidate()
+
+
+@router.delete("/{category_id}")
+async def delete_vehicle_category(
+        category_id: int, db: DbSession = Depends(get_db)):
+    await run_db(db, _delete_vehicle_category, category_id)
     return {"message": "Vehicle category deleted successfully"}
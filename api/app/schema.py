@@ -0,0 +1,55 @@
+"""Schema versioning.
+
+The schema is created and changed by one migration command that runs
+before the workers start, not by every worker on boot:
+
+    python init_db.py
+
+It records SCHEMA_VERSION in the schema_version table. Workers only read
+that row on startup and refuse to report ready while the database is
+behind the code. Bump SCHEMA_VERSION with every change to the models.
+"""
+from sqlalchemy import func, inspect, insert, select
+from typing import Optional
+import logging
+
+from .models import SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+def schema_version(conn) -> Optional[int]:
+    """The newest applied version, None if the database was never
+    migrated."""
+    if not inspect(conn).has_table(SchemaVersion.__tablename__):
+        return None
+    return conn.execute(select(func.max(SchemaVersion.version))).scalar()
+
+
+def record_schema_version(conn, version: int = SCHEMA_VERSION):
+    if conn.execute(select(SchemaVersion.version)
+                    .where(SchemaVersion.version == version)).first():
+        return
+    conn.execute(insert(SchemaVersion).values(version=version))
+
+
+def check_schema_version(conn) -> int:
+    """Raise SchemaVersionError unless the database is at least at
+    SCHEMA_VERSION, returns the database's version."""
+    version = schema_version(conn)
+    if version is None or version < SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"Database schema is at version {version}, the code needs "
+            f"{SCHEMA_VERSION}. Run `python init_db.py` to migrate.")
+    if version > SCHEMA_VERSION:
+        # A newer release migrated already, e.g. during a rolling deploy.
+        # Migrations only add to the schema, older code keeps working.
+        logger.warning("Database schema version %d is newer than %d",
+                       version, SCHEMA_VERSION)
+    return version
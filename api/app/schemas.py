@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 from datetime import datetime
 from typing import Optional
 
@@ -16,9 +16,24 @@ class OrderCreate(OrderBase):
     pass
 
 
+class OrderUpdate(BaseModel):
+    # Partial update, only the fields that are sent are changed
+    brand: Optional[str] = Field(None, example="Mercedes")
+    price: Optional[float] = Field(None, ge=0, example=999.99)
+    vehicle_category_id: Optional[int] = Field(None, example=1)
+    status_id: Optional[int] = Field(None, example=1)
+
+    @validator("brand", "price", "status_id", pre=True)
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
+
 class OrderResponse(OrderBase):
     id: int
     created_at: datetime
+    version: int = 1
     vehicle_category_id: Optional[int] = None
     status_id: Optional[int] = None
 
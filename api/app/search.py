@@ -0,0 +1,38 @@
+from sqlalchemy.orm import Session
+import os
+
+from .models import Order
+from .partitions import ORDER_PARTITIONS
+
+# "fulltext" uses the ngram FULLTEXT index on orders.brand (MySQL only),
+# "like" keeps the plain substring scan. Partitioned tables have no
+# FULLTEXT index.
+SEARCH_BACKEND = os.getenv(
+    "ORDER_SEARCH_BACKEND", "like" if ORDER_PARTITIONS else "fulltext").lower()
+
+# Must match the server's ngram_token_size, shorter terms produce no tokens
+NGRAM_TOKEN_SIZE = int(os.getenv("NGRAM_TOKEN_SIZE", "2"))
+
+
+def _fulltext_phrase(term: str) -> str:
+    # A quoted phrase makes the ngram parser match the tokens in sequence,
+    # which behaves like a substring match. Quotes inside would end it early.
+    return '"' + term.replace('"', " ").strip() + '"'
+
+
+def uses_fulltext(dialect_name: str, term: str) -> bool:
+    return (SEARCH_BACKEND == "fulltext"
+            and dialect_name == "mysql"
+            and len(term.replace('"', "").strip()) >= NGRAM_TOKEN_SIZE)
+
+
+def brand_search_clause(db: Session, term: str, column=Order.brand):
+    """Filter clause matching orders whose brand contains term.
+
+    Both paths compare with the column collation (utf8mb4_slovak_ci), so
+    case folding and diacritics behave the same way either way. column is
+    the brand column of orders or of the archive, both have the index.
+    """
+    if uses_fulltext(db.get_bind().dialect.name, term):
+        return column.match(_fulltext_phrase(term))
+    return column.ilike(f"%{term}%")
@@ -0,0 +1,44 @@
+from fastapi.responses import Response
+from typing import Iterable
+import orjson
+
+from .models import Order
+
+# Columns of an order as returned by the API, selected as plain tuples
+ORDER_COLUMNS = (
+    Order.id,
+    Order.brand,
+    Order.price,
+    Order.vehicle_category_id,
+    Order.status_id,
+    Order.created_at,
+    Order.version
+)
+ORDER_FIELDS = tuple(column.key for column in ORDER_COLUMNS)
+
+
+def order_to_dict(order) -> dict:
+    """API fields of an ORM order or of a full orders row mapping."""
+    if isinstance(order, dict):
+        return {field: order[field] for field in ORDER_FIELDS}
+    return {field: getattr(order, field) for field in ORDER_FIELDS}
+
+
+def order_rows_to_dicts(rows: Iterable[tuple]) -> list:
+    return [dict(zip(ORDER_FIELDS, row)) for row in rows]
+
+
+def json_response(content, status_code: int = 200, headers=None) -> Response:
+    """Render content with orjson, skipping response_model validation.
+
+    Only for data that already has the response shape, e.g. rows read from
+    the database. orjson writes datetimes in ISO 8601 like jsonable_encoder.
+    """
+    return Response(content=orjson.dumps(content), status_code=status_code,
+                    headers=headers, media_type="application/json")
+
+
+def order_page_response(page: dict, headers=None) -> Response:
+    return json_response(
+        {**page, "items": order_rows_to_dicts(page["items"])},
+        headers=headers)
@@ -0,0 +1,96 @@
+"""Worker warm-up.
+
+Workers do not create or change the schema, see app.schema. On startup a
+worker begins serving right away and warms up in the background: it
+checks the schema version, opens its pool connections and loads the
+lookup cache. Until that succeeded, `warmup.ready` is False, failed
+attempts are retried every STARTUP_RETRY_INTERVAL seconds.
+"""
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Optional
+import asyncio
+import logging
+import os
+
+from .database import SessionLocal, engine
+from .lookup_cache import lookup_cache
+from .routes.batch import LOOKUPS
+from .schema import check_schema_version
+
+logger = logging.getLogger(__name__)
+
+# Seconds between warm-up attempts while the database is unavailable or
+# not migrated yet
+STARTUP_RETRY_INTERVAL = float(os.getenv("STARTUP_RETRY_INTERVAL", "2"))
+
+
+class Warmup:
+    def __init__(self, engine, session_factory,
+                 retry_interval: float = STARTUP_RETRY_INTERVAL):
+        self.engine = engine
+        self.session_factory = session_factory
+        self.retry_interval = retry_interval
+        self.ready = False
+        self.error: Optional[str] = None
+        self._task = None
+
+    async def start(self, migrate: Optional[Callable[[], None]] = None):
+        """Warm up in the background. migrate runs first, on the
+        threadpool, for setups that migrate from the worker itself."""
+        self.ready = False
+        self.error = None
+        self._task = asyncio.get_running_loop().create_task(
+            self._run(migrate))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, migrate):
+        while True:
+            try:
+                if migrate is not None:
+                    await run_in_threadpool(migrate)
+                    migrate = None
+                await self.warm_up()
+            except Exception as e:
+                self.error = str(e)
+                logger.warning("Warm-up failed, retrying in %.0fs: %s",
+                               self.retry_interval, e)
+                await asyncio.sleep(self.retry_interval)
+                continue
+            self.ready = True
+            self.error = None
+            logger.info("Worker is ready")
+            return
+
+    def _check_database(self):
+        with self.engine.connect() as conn:
+            check_schema_version(conn)
+        # Connect the whole pool now instead of on the first requests.
+        # Pools without a size, e.g. NullPool, keep nothing open.
+        size = getattr(self.engine.pool, "size", None)
+        connections = []
+        try:
+            for _ in range(size() if size is not None else 0):
+                connections.append(self.engine.connect())
+        finally:
+            for connection in connections:
+                connection.close()
+
+    async def warm_up(self):
+        await run_in_threadpool(self._check_database)
+        db = self.session_factory()
+        try:
+            for name, loader in LOOKUPS.items():
+                await lookup_cache.fetch(name, db, loader)
+        finally:
+            db.close()
+
+
+warmup = Warmup(engine, SessionLocal)
@@ -0,0 +1,203 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from .filters import apply_order_filters
+from .models import ArchivedOrder, Order, OrderDailyRollup
+from .rollups import NO_CATEGORY
+from .search import brand_search_clause, uses_fulltext
+
+GROUP_FIELDS = {
+    "status": "status_id",
+    "category": "vehicle_category_id",
+    "brand": "brand"
+}
+
+INTERVALS = ("day", "week", "month")
+
+# Filters the rollups can answer, price filters need the orders themselves
+ROLLUP_FILTERS = {"search", "status_id", "category_id", "date_from",
+                  "date_to"}
+
+SOURCE_ROLLUP = "rollup"
+SOURCE_ORDERS = "orders"
+
+
+def parse_group_by(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    groups = []
+    for name in value.split(","):
+        name = name.strip().lower()
+        if name not in GROUP_FIELDS:
+            raise ValueError(f"Unknown group_by field: {name}")
+        if name not in groups:
+            groups.append(name)
+    return groups
+
+
+def rollup_compatible(filters: dict, dialect_name: str = "") -> bool:
+    """Whether the daily rollups give the same answer as the orders table.
+
+    Dates must cover whole days: date_from at midnight and date_to at the end
+    of a day, which is what the plain YYYY-MM-DD forms parse to. Brand
+    search must use the LIKE backend, FULLTEXT matching needs the orders
+    index, so the totals agree with the order list.
+    """
+    if set(filters) - ROLLUP_FILTERS:
+        return False
+    if "search" in filters and uses_fulltext(dialect_name, filters["search"]):
+        return False
+    date_from = filters.get("date_from")
+    if date_from is not None and date_from.time() != time.min:
+        return False
+    date_to = filters.get("date_to")
+    if date_to is not None and date_to.time() < time(23, 59, 59):
+        return False
+    return True
+
+
+def _rollup_query(db: Session, filters: dict, group_fields: list):
+    rollup = OrderDailyRollup
+    columns = [getattr(rollup, field) for field in group_fields]
+    query = db.query(
+        *columns,
+        func.sum(rollup.order_count),
+        func.sum(rollup.price_sum),
+        func.min(rollup.price_min),
+        func.max(rollup.price_max)
+    )
+    if "search" in filters:
+        # Same matching as the order list, always LIKE here, see
+        # rollup_compatible. The rollup table is small, the scan is cheap.
+        query = query.filter(
+            brand_search_clause(db, filters["search"], column=rollup.brand))
+    if "status_id" in filters:
+        query = query.filter(rollup.status_id == filters["status_id"])
+    if "category_id" in filters:
+        query = query.filter(
+            rollup.vehicle_category_id == filters["category_id"])
+    if "date_from" in filters:
+        query = query.filter(rollup.day >= filters["date_from"].date())
+    if "date_to" in filters:
+        query = query.filter(rollup.day <= filters["date_to"].date())
+    return query.group_by(*columns) if columns else query
+
+
+def _orders_query(db: Session, filters: dict, group_fields: list,
+                  model=Order):
+    columns = [func.date(model.created_at) if field == "day"
+               else getattr(model, field) for field in group_fields]
+    query = db.query(
+        *columns,
+        func.count(model.id),
+        func.sum(model.price),
+        func.min(model.price),
+        func.max(model.price)
+    )
+    query = apply_order_filters(query, filters, model)
+    return query.group_by(*columns) if columns else query
+
+
+def _orders_rows(db: Session, filters: dict, group_fields: list) -> list:
+    # Live and archived orders aggregated separately, merged per group
+    merged = {}
+    for model in (Order, ArchivedOrder):
+        for row in _orders_query(db, filters, group_fields, model).all():
+            keys = tuple(row[:len(group_fields)])
+            target = merged.setdefault(
+                keys, {"count": 0, "sum": 0.0, "min": None, "max": None})
+            _merge(target, *row[len(group_fields):])
+    return [(*keys, target["count"], target["sum"], target["min"],
+             target["max"]) for keys, target in merged.items()]
+
+
+def _rollup_rows(db: Session, filters: dict, group_fields: list) -> list:
+    return _rollup_query(db, filters, group_fields).all()
+
+
+def _as_date(value) -> date:
+    # DATE() comes back as a string on SQLite
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _bucket(day: date, interval: str) -> date:
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _metrics(count, total, low, high) -> dict:
+    count = int(count or 0)
+    total = float(total or 0)
+    return {
+        "count": count,
+        "sum": round(total, 2),
+        "min": low,
+        "max": high,
+        "avg": round(total / count, 2) if count else None
+    }
+
+
+def _merge(target: dict, count, total, low, high):
+    target["count"] += count or 0
+    target["sum"] += total or 0
+    if low is not None:
+        target["min"] = low if target["min"] is None else min(
+            target["min"], low)
+    if high is not None:
+        target["max"] = high if target["max"] is None else max(
+            target["max"], high)
+
+
+def order_stats(db: Session, filters: dict, group_by: List[str],
+                interval: Optional[str] = None) -> dict:
+    """Order count and price aggregates for the filtered orders.
+
+    Served from the daily rollups when the filters allow it, otherwise
+    aggregated from the live and archived orders directly.
+    """
+    source = SOURCE_ROLLUP if rollup_compatible(
+        filters, db.get_bind().dialect.name) else SOURCE_ORDERS
+    rows = _rollup_rows if source == SOURCE_ROLLUP else _orders_rows
+
+    group_fields = [GROUP_FIELDS[name] for name in group_by]
+    totals = _metrics(*rows(db, filters, [])[0])
+
+    groups = []
+    for row in rows(db, filters, group_fields) if group_fields else []:
+        keys = dict(zip(group_fields, row[:len(group_fields)]))
+        if keys.get("vehicle_category_id") == NO_CATEGORY:
+            keys["vehicle_category_id"] = None
+        groups.append({**keys, **_metrics(*row[len(group_fields):])})
+
+    series = None
+    if interval:
+        # Daily rows are merged into weeks or months here, which avoids
+        # dialect specific date functions in SQL
+        buckets = {}
+        for day, *values in rows(db, filters, ["day"]):
+            bucket = _bucket(_as_date(day), interval)
+            target = buckets.setdefault(
+                bucket, {"count": 0, "sum": 0.0, "min": None, "max": None})
+            _merge(target, *values)
+        series = [
+            {"bucket": bucket.isoformat(),
+             **_metrics(target["count"], target["sum"], target["min"],
+                        target["max"])}
+            for bucket, target in sorted(buckets.items())
+        ]
+
+    return {
+        "source": source,
+        "totals": totals,
+        "groups": groups,
+        "series": series
+    }
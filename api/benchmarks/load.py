@@ -0,0 +1,342 @@
+"""Load test for the orders API: latency percentiles and throughput.
+
+Drives the real endpoints with a weighted mix of requests from a number of
+concurrent clients and reports p50/p95/p99 latency and requests per second
+per operation. Runs either against a server (--base-url) or in-process
+against the ASGI app (--in-process, uses DATABASE_URL directly), so a local
+database is all it needs.
+
+    # seed 100k orders through the bulk import, then run for 60 seconds
+    python -m benchmarks.load --seed 100000 --duration 60
+
+    # store the result as the baseline, later runs are compared to it
+    python -m benchmarks.load --duration 60 --save-baseline
+    python -m benchmarks.load --duration 60 --max-regression 0.2
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import httpx
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+DEFAULT_MIX = "list=35,deep_page=10,cursor=10,search=20,create=15,batch_update=10"
+
+# Brand popularity roughly like a used car market, the long tail is rare
+BRANDS = [
+    ("Škoda", 18), ("Volkswagen", 16), ("Toyota", 10), ("Ford", 9),
+    ("Hyundai", 7), ("Renault", 7), ("BMW", 6), ("Mercedes-Benz", 6),
+    ("Audi", 5), ("Kia", 5), ("Peugeot", 4), ("Dacia", 3), ("Volvo", 2),
+    ("Citroën", 1), ("Honda", 1)
+]
+SEARCH_TERMS = ["koda", "Volks", "toy", "BMW", "benz", "Audi", "ë", "Re"]
+
+SEED_CHUNK_SIZE = 5000
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of values, 0 for none."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2)
+    }
+
+
+def compare_to_baseline(results: dict, baseline: dict,
+                        max_regression: float) -> List[str]:
+    """Operations whose p95 grew or whose throughput dropped by more than
+    max_regression (a fraction) compared to the baseline."""
+    regressions = []
+    for name, current in results["operations"].items():
+        previous = baseline.get("operations", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > \
+                previous["p95_ms"] * (1 + max_regression):
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if previous["rps"] and current["rps"] < \
+                previous["rps"] * (1 - max_regression):
+            regressions.append(
+                f"{name}: {previous['rps']} -> {current['rps']} req/s")
+    return regressions
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def random_order(status_ids: List[int], category_ids: List[int]) -> dict:
+    brands, weights = zip(*BRANDS)
+    return {
+        "brand": random.choices(brands, weights)[0],
+        # Log-normal prices, most orders are cheap, a few very expensive
+        "price": round(min(random.lognormvariate(8, 0.9), 500000), 2),
+        "vehicle_category_id": random.choice(category_ids),
+        "status_id": random.choice(status_ids)
+    }
+
+
+def random_filters(context: dict) -> dict:
+    params = {}
+    if random.random() < 0.5:
+        params["status"] = str(random.choice(context["status_ids"]))
+    if random.random() < 0.4:
+        params["category"] = str(random.choice(context["category_ids"]))
+    if random.random() < 0.3:
+        start = datetime.now() - timedelta(days=random.randint(1, 720))
+        params["date_from"] = start.strftime("%Y-%m-%d")
+        params["date_to"] = (start + timedelta(days=30)).strftime("%Y-%m-%d")
+    if random.random() < 0.2:
+        params["price_from"] = str(random.choice([1000, 5000, 10000]))
+    return params
+
+
+async def op_list(client: httpx.AsyncClient, context: dict):
+    params = {**random_filters(context), "per_page": 20}
+    return await client.get("/api/orders", params=params)
+
+
+async def op_deep_page(client: httpx.AsyncClient, context: dict):
+    # OFFSET pagination near the end of the unfiltered list
+    pages = max(context["total"] // 20, 1)
+    page = random.randint(max(int(pages * 0.9), 1), pages)
+    return await client.get("/api/orders", params={"page": page})
+
+
+async def op_cursor(client: httpx.AsyncClient, context: dict):
+    params = {"pagination": "cursor", "per_page": 20}
+    if context["cursors"]:
+        params["cursor"] = random.choice(context["cursors"])
+    response = await client.get("/api/orders", params=params)
+    if response.status_code == 200:
+        cursor = response.json().get("next_cursor")
+        if cursor:
+            context["cursors"].append(cursor)
+            del context["cursors"][:-1000]
+    return response
+
+
+async def op_search(client: httpx.AsyncClient, context: dict):
+    return await client.get(
+        "/api/orders", params={"search": random.choice(SEARCH_TERMS)})
+
+
+async def op_create(client: httpx.AsyncClient, context: dict):
+    response = await client.post("/api/orders", json=random_order(
+        context["status_ids"], context["category_ids"]))
+    if response.status_code == 200:
+        context["order_ids"].append(response.json()["id"])
+    return response
+
+
+async def op_batch_update(client: httpx.AsyncClient, context: dict):
+    ids = random.sample(context["order_ids"],
+                        min(50, len(context["order_ids"])))
+    return await client.post("/api/orders/batch/update", json={
+        "ids": ids,
+        "changes": {"status_id": random.choice(context["status_ids"])}
+    })
+
+
+OPERATIONS = {
+    "list": op_list,
+    "deep_page": op_deep_page,
+    "cursor": op_cursor,
+    "search": op_search,
+    "create": op_create,
+    "batch_update": op_batch_update
+}
+
+
+async def load_context(client: httpx.AsyncClient) -> dict:
+    statuses = (await client.get("/api/statuses")).json()
+    categories = (await client.get("/api/vehicle-categories/")).json()
+    first_page = (await client.get(
+        "/api/orders", params={"per_page": 100})).json()
+    return {
+        "status_ids": [int(status_id) for status_id in statuses],
+        "category_ids": [category["id"] for category in categories],
+        "total": first_page["total"] or 0,
+        "order_ids": [order["id"] for order in first_page["items"]],
+        "cursors": []
+    }
+
+
+async def seed(client: httpx.AsyncClient, context: dict, count: int):
+    """Add count orders through the NDJSON bulk import."""
+    started = time.perf_counter()
+    inserted = 0
+    while inserted < count:
+        chunk = min(SEED_CHUNK_SIZE, count - inserted)
+        body = "\n".join(
+            json.dumps(random_order(context["status_ids"],
+                                    context["category_ids"]),
+                       ensure_ascii=False)
+            for _ in range(chunk))
+        response = await client.post(
+            "/api/orders/bulk", content=body.encode("utf-8"),
+            headers={"Content-Type": "application/x-ndjson"}, timeout=None)
+        response.raise_for_status()
+        inserted += response.json()["inserted"]
+        rate = inserted / (time.perf_counter() - started)
+        print(f"\rSeeded {inserted}/{count} orders ({rate:.0f}/s)", end="",
+              file=sys.stderr)
+    print(file=sys.stderr)
+
+
+async def run(client: httpx.AsyncClient, context: dict, mix: Dict[str, float],
+              concurrency: int, duration: float,
+              requests: Optional[int]) -> dict:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    deadline = time.perf_counter() + duration
+    remaining = [requests]
+
+    def more() -> bool:
+        if remaining[0] is not None:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+        return time.perf_counter() < deadline
+
+    async def worker():
+        while more():
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await OPERATIONS[name](client, context)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            if failed:
+                errors[name] += 1
+            else:
+                latencies[name].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [value for values in latencies.values()
+                     for value in values]
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "orders": context["total"],
+        "total": summarize(all_latencies, sum(errors.values()), elapsed),
+        "operations": {
+            name: summarize(latencies[name], errors[name], elapsed)
+            for name in names
+        }
+    }
+
+
+def print_results(results: dict):
+    print(f"{'operation':<14}{'requests':>9}{'errors':>8}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    rows = [*results["operations"].items(), ("total", results["total"])]
+    for name, stats in rows:
+        print(f"{name:<14}{stats['requests']:>9}{stats['errors']:>8}"
+              f"{stats['rps']:>9}{stats['p50_ms']:>9}{stats['p95_ms']:>9}"
+              f"{stats['p99_ms']:>9}")
+
+
+def make_client(args) -> httpx.AsyncClient:
+    if args.in_process:
+        from app.main import app
+        return httpx.AsyncClient(app=app, base_url="http://benchmark",
+                                 timeout=args.timeout)
+    return httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout,
+                             limits=httpx.Limits(
+                                 max_connections=args.concurrency))
+
+
+async def main_async(args) -> int:
+    async with make_client(args) as client:
+        context = await load_context(client)
+        if args.seed:
+            await seed(client, context, args.seed)
+            context = await load_context(client)
+        if not args.duration and not args.requests:
+            return 0
+
+        results = await run(client, context, parse_mix(args.mix),
+                            args.concurrency, args.duration, args.requests)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(
+            results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8008")
+    parser.add_argument("--in-process", action="store_true",
+                        help="call the ASGI app directly, no server needed")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="orders to add before the run")
+    parser.add_argument("--duration", type=float, default=30,
+                        help="seconds to run, 0 to only seed")
+    parser.add_argument("--requests", type=int,
+                        help="stop after this many requests instead")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help="operation weights, e.g. list=3,create=1")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed p95/throughput change, as a fraction")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,226 @@
 from app.database import engine, SessionLocal
-from app.models import Base, OrderStatus, VehicleCategory, Order
+from app.models import Base, OrderStatus, VehicleCategory, Order, OrderDailyRollup
+from app.rollups import rebuild_rollups
+from app.change_tokens import ORDERS_TOKEN, bump_token, current_token
+from app.partitions import (ORDER_PARTITIONS, maintain_partitions,
+                            orders_partitions, partition_orders)
+from app.schema import SCHEMA_VERSION, record_schema_version, schema_version
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.exc import IntegrityError, OperationalError
+import argparse
+import csv
+import tempfile
 import time
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import random
 
+# Rows generated and inserted per transaction by --orders
+SEED_CHUNK_SIZE = int(os.getenv("SEED_CHUNK_SIZE", "10000"))
+
+# Synthetic orders span this many days back from now
+SEED_DAYS = 730
+
+# Brand popularity roughly like a used car market
+SEED_BRANDS = {
+    "Škoda": 18, "Volkswagen": 16, "Toyota": 10, "Ford": 9, "Hyundai": 7,
+    "Renault": 7, "BMW": 6, "Mercedes-Benz": 6, "Audi": 5, "Kia": 5,
+    "Peugeot": 4, "Dacia": 3, "Volvo": 2, "Citroën": 1, "Honda": 1
+}
+
+# Status weights for recent orders and for ones older than a month, most
+# old orders are done or cancelled
+SEED_STATUSES_RECENT = {
+    "Nové": 45, "Vybavuje sa": 35, "Vybavené": 15, "Stornované": 5}
+SEED_STATUSES_OLD = {
+    "Nové": 2, "Vybavuje sa": 3, "Vybavené": 80, "Stornované": 15}
+
+SEED_CATEGORIES = {"PKW": 85, "LKW": 15}
+
+ORDER_SEED_COLUMNS = ("brand", "price", "vehicle_category_id", "status_id",
+                      "created_at", "version")
+
+
+def prepare_ddl_connection(conn):
+    if conn.dialect.name == "mysql":
+        # With stopwords enabled the ngram parser drops every token that
+        # contains one (e.g. "a"), which breaks brand search
+        conn.execute(text("SET SESSION innodb_ft_enable_stopword = OFF"))
+
+
+def ensure_columns(conn):
+    # create_all skips existing tables, so add columns introduced later.
+    # New columns need a server default to fill the existing rows.
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"]
+                    for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}"))
+                print(f"Added column {table.name}.{column.name}")
+
+
+def ensure_indexes(conn):
+    # create_all skips existing tables, so add indexes introduced later
+    inspector = inspect(conn)
+    # Partitioned tables cannot have FULLTEXT indexes
+    partitioned = {"orders"} if orders_partitions(conn) else set()
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"]
+                    for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if table.name in partitioned and \
+                    index.dialect_options["mysql"]["prefix"] == "FULLTEXT":
+                continue
+            if index.name not in existing:
+                index.create(bind=conn)
+                print(f"Created index {index.name}")
+
+
+def backfill_rollups(db):
+    # Orders written before the rollup table existed, or by the seeding
+    # below, are not counted yet
+    if db.query(OrderDailyRollup).first() is None and \
+            db.query(Order).first() is not None:
+        rebuild_rollups(db)
+        db.commit()
+        print("Rebuilt order rollups")
+
+
+def ensure_change_tokens(db):
+    # List ETags are only issued once the orders token exists
+    if current_token(db, ORDERS_TOKEN) is None:
+        bump_token(db, ORDERS_TOKEN)
+        db.commit()
+
+
+def generate_orders(count, status_map, category_map, chunk_size=SEED_CHUNK_SIZE,
+                    now=None):
+    """Yields count synthetic orders as lists of ORDER_SEED_COLUMNS tuples,
+    at most chunk_size rows each."""
+    now = (now or datetime.utcnow()).replace(microsecond=0)
+    brands = list(SEED_BRANDS)
+    brand_weights = list(SEED_BRANDS.values())
+    categories = [category_map[name] for name in SEED_CATEGORIES]
+    category_weights = list(SEED_CATEGORIES.values())
+    statuses = [status_map[name] for name in SEED_STATUSES_RECENT]
+    recent_weights = list(SEED_STATUSES_RECENT.values())
+    old_weights = [SEED_STATUSES_OLD[name] for name in SEED_STATUSES_RECENT]
+    truck = category_map["LKW"]
+    span = SEED_DAYS * 86400
+    recent = 30 * 86400
+    lognormvariate = random.lognormvariate
+    rand = random.random
+
+    for offset in range(0, count, chunk_size):
+        size = min(chunk_size, count - offset)
+        # Draw whole columns at once, random.choices is far faster with k
+        # than called per row
+        row_brands = random.choices(brands, brand_weights, k=size)
+        row_categories = random.choices(categories, category_weights, k=size)
+        row_recent = random.choices(statuses, recent_weights, k=size)
+        row_old = random.choices(statuses, old_weights, k=size)
+        rows = []
+        for index in range(size):
+            # Order volume grows over time, sqrt skews ages to the present
+            age = int(span * (1 - rand() ** 0.5))
+            category_id = row_categories[index]
+            # Log-normal prices, mostly a few thousand, rarely six figures.
+            # Trucks cost about three times as much.
+            price = min(lognormvariate(8.3, 0.8), 500000)
+            if category_id == truck:
+                price *= 3
+            rows.append((
+                row_brands[index], round(price, 2), category_id,
+                row_recent[index] if age < recent else row_old[index],
+                now - timedelta(seconds=age), 1))
+        yield rows
+
+
+def _insert_rows(conn, rows):
+    # Plain tuples straight to the driver's executemany, which PyMySQL
+    # rewrites into multi-row INSERT statements
+    marker = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    conn.exec_driver_sql(
+        f"INSERT INTO orders ({', '.join(ORDER_SEED_COLUMNS)}) "
+        f"VALUES ({', '.join([marker] * len(ORDER_SEED_COLUMNS))})", rows)
+
+
+def _load_data_rows(conn, rows):
+    # LOAD DATA LOCAL INFILE skips SQL parsing entirely, needs local_infile
+    # enabled on the server
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="",
+                                     encoding="utf-8") as f:
+        csv.writer(f, lineterminator="\n").writerows(rows)
+        f.flush()
+        conn.execute(text(
+            f"LOAD DATA LOCAL INFILE '{f.name}' INTO TABLE orders "
+            "CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' "
+            "OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\n' "
+            f"({', '.join(ORDER_SEED_COLUMNS)})"))
+
+
+def seed_orders(count, chunk_size=SEED_CHUNK_SIZE, load_data=False):
+    """Adds count synthetic orders, chunk_size rows per transaction."""
+    db = SessionLocal()
+    try:
+        status_map = {
+            status.status: status.id for status in db.query(OrderStatus).all()}
+        category_map = {
+            category.name: category.id for category in db.query(VehicleCategory).all()}
+    finally:
+        db.close()
+
+    seed_engine = engine
+    if load_data:
+        if engine.dialect.name != "mysql":
+            raise ValueError("--load-data needs a MySQL database")
+        seed_engine = create_engine(engine.url,
+                                    connect_args={"local_infile": True})
+    load = _load_data_rows if load_data else _insert_rows
+
+    started = time.perf_counter()
+    inserted = 0
+    for chunk in generate_orders(count, status_map, category_map, chunk_size):
+        with seed_engine.begin() as conn:
+            if conn.dialect.name == "mysql":
+                # The generated keys are valid, skip checking every row
+                conn.execute(text(
+                    "SET SESSION unique_checks = 0, foreign_key_checks = 0"))
+            load(conn, chunk)
+        inserted += len(chunk)
+        elapsed = time.perf_counter() - started
+        rate = inserted / elapsed
+        print(f"Inserted {inserted}/{count} orders ({rate:.0f}/s, "
+              f"{(count - inserted) / rate:.0f}s left)", flush=True)
+    if seed_engine is not engine:
+        seed_engine.dispose()
+
+    db = SessionLocal()
+    try:
+        # Rollups from scratch is one GROUP BY, cheaper than maintaining
+        # them per chunk. The token bump invalidates cached list pages.
+        rebuild_rollups(db)
+        bump_token(db, ORDERS_TOKEN)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Seeded {inserted} orders in {time.perf_counter() - started:.1f}s")
+
 
 def init_db(force_recreate=False):
+    """Migrate the schema and seed an empty database. Runs once before
+    the workers start, see app.schema."""
     max_retries = 30
     retry_interval = 1  # seconds
 
@@ -19,9 +231,21 @@ def init_db(force_recreate=False):
                 Base.metadata.drop_all(bind=engine)
                 print("Dropped all existing tables")
 
-            # Create all tables
-            Base.metadata.create_all(bind=engine)
-            print("Created all tables")
+            with engine.begin() as conn:
+                prepare_ddl_connection(conn)
+                version = schema_version(conn)
+                if force_recreate or version is None or \
+                        version < SCHEMA_VERSION:
+                    # Create all tables
+                    Base.metadata.create_all(bind=conn)
+                    ensure_columns(conn)
+                    ensure_indexes(conn)
+                    record_schema_version(conn)
+                    print(f"Migrated schema to version {SCHEMA_VERSION}")
+                else:
+                    print(f"Schema is up to date (version {version})")
+                if ORDER_PARTITIONS and partition_orders(conn):
+                    print("Partitioned orders by month")
 
             db = SessionLocal()
             try:
@@ -75,10 +299,16 @@ def init_db(force_recreate=False):
                             db.add(order)
                         db.commit()
                     print("Created sample orders")
+                    backfill_rollups(db)
+                    ensure_change_tokens(db)
 
                     print("Database initialized successfully with sample data!")
                 else:
                     print("Database already contains data, skipping initialization.")
+                    backfill_rollups(db)
+                    ensure_change_tokens(db)
+                if ORDER_PARTITIONS:
+                    maintain_partitions(db)
 
                 return
 
@@ -100,6 +330,17 @@ def init_db(force_recreate=False):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Create or migrate and seed the database")
+    parser.add_argument("--orders", type=int, default=0,
+                        help="add this many synthetic orders")
+    parser.add_argument("--chunk-size", type=int, default=SEED_CHUNK_SIZE)
+    parser.add_argument("--load-data", action="store_true",
+                        help="load with LOAD DATA LOCAL INFILE (MySQL)")
+    args = parser.parse_args()
+
     # Use environment variable to control whether to force recreate tables
     force_recreate = os.getenv("FORCE_RECREATE_DB", "false").lower() == "true"
     init_db(force_recreate)
+    if args.orders:
+        seed_orders(args.orders, args.chunk_size, args.load_data)
@@ -5,6 +5,15 @@ from fastapi.testclient import TestClient
 from app.main import app
 from app.database import get_db, Base, engine as prod_engine
 from app.models import OrderStatus, VehicleCategory
+from app.counts import order_counts
+from app.lookup_cache import lookup_cache
+from app.http_cache import order_list_cache
+from app.metrics import instrument_engine
+from app.replicas import get_read_db
+from app.schema import record_schema_version
+from app.startup import warmup
+from app.probe import PRIMARY, health_probe
+import asyncio
 import os
 
 # Use test database
@@ -14,6 +23,8 @@ test_engine = create_engine(
     pool_pre_ping=True,
     pool_recycle=3600
 )
+# Count test queries in the request metrics like the app engine's
+instrument_engine(test_engine, "test")
 TestingSessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -47,6 +58,8 @@ def init_test_data(session):
 def setup_test_database():
     # Create test database tables
     Base.metadata.create_all(bind=test_engine)
+    with test_engine.begin() as conn:
+        record_schema_version(conn)
 
     # Initialize test data
     session = TestingSessionLocal()
@@ -65,19 +78,34 @@ def clean_database():
     # Clean up before each test
     session = TestingSessionLocal()
     try:
-        # Don't delete statuses and categories
+        # Don't delete statuses, categories and the schema version
         tables_to_clean = [table for table in reversed(Base.metadata.sorted_tables)
-                           if table.name not in ['order_statuses', 'vehicle_categories']]
+                           if table.name not in ['order_statuses', 'vehicle_categories',
+                                                 'schema_version']]
         for table in tables_to_clean:
             session.execute(table.delete())
         session.commit()
     finally:
         session.close()
+    # Rows were removed behind the API's back, drop cached data
+    order_counts.invalidate()
+    lookup_cache.invalidate()
+    order_list_cache.clear()
     yield
 
 
 @pytest.fixture(scope="session")
-def client():
+def event_loop():
+    # One loop for the whole session. The TestClient runs the app on it,
+    # pytest-asyncio's default per-test loop would close it under the app.
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def client(event_loop):
     # Override the app's database URL for testing
     os.environ["DATABASE_URL"] = SQLALCHEMY_DATABASE_URL
 
@@ -90,6 +118,11 @@ def client():
             db.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    # Warm up and probe against the test database as well
+    warmup.engine = test_engine
+    warmup.session_factory = TestingSessionLocal
+    health_probe.engines = {PRIMARY: test_engine}
 
     # Create test client with base URL that includes /api prefix
     with TestClient(app, base_url="http://testserver") as client:
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+from app.archive import (archive_batch, archive_candidates, archive_orders,
+                         archive_status_ids, includes_archive)
+from app.models import ArchivedOrder, Order, OrderStatus, VehicleCategory
+from app.rollups import rebuild_rollups
+
+
+def _add_orders(session):
+    statuses = {status.status: status.id
+                for status in session.query(OrderStatus).all()}
+    category = session.query(VehicleCategory).first()
+    now = datetime.utcnow()
+    orders = [
+        # Old and finished: archived
+        (now - timedelta(days=800), "Vybavené"),
+        (now - timedelta(days=700), "Stornované"),
+        (now - timedelta(days=600), "Vybavené"),
+        # Old but still open, or finished but recent: stay live
+        (now - timedelta(days=500), "Nové"),
+        (now - timedelta(days=10), "Vybavené"),
+    ]
+    for index, (created_at, status) in enumerate(orders):
+        session.add(Order(
+            brand=f"Archive Brand {index}", price=100.0 + index,
+            status_id=statuses[status], vehicle_category_id=category.id,
+            created_at=created_at))
+    session.flush()
+    rebuild_rollups(session)
+    session.commit()
+    return [order.id for order in
+            session.query(Order).order_by(Order.created_at.desc())]
+
+
+def test_includes_archive():
+    watermark = datetime(2023, 6, 1)
+    assert not includes_archive({}, watermark)
+    assert not includes_archive({"date_from": datetime(2023, 1, 1)}, None)
+    assert not includes_archive({"status_id": 1}, watermark)
+    assert includes_archive({"date_from": datetime(2023, 1, 1)}, watermark)
+    assert includes_archive({"date_to": datetime(2024, 1, 1)}, watermark)
+    assert not includes_archive({"date_from": datetime(2023, 7, 1)},
+                                watermark)
+
+
+def test_archive_orders(client, db_session):
+    ids = _add_orders(db_session)
+    totals = client.get("/api/orders/stats").json()
+
+    # One order per batch, the last batch finds nothing
+    assert archive_orders(db_session, older_than_days=365, batch_size=1,
+                          pause=0) == 3
+    db_session.expire_all()
+    assert sorted(order.id for order in db_session.query(ArchivedOrder)) == \
+        sorted(ids[2:])
+    assert db_session.query(Order).count() == 2
+    assert archive_orders(db_session, older_than_days=365, pause=0) == 0
+
+    # Without a date filter only the live orders are listed
+    response = client.get("/api/orders")
+    assert response.json()["total"] == 2
+    assert [order["id"] for order in response.json()["items"]] == ids[:2]
+
+    # A date range reaching back merges both tiers, in order
+    date_from = (datetime.utcnow() - timedelta(days=1000)).date().isoformat()
+    response = client.get(
+        f"/api/orders?date_from={date_from}&per_page=2&page=2")
+    assert response.json()["total"] == 5
+    assert [order["id"] for order in response.json()["items"]] == ids[2:4]
+
+    cursor_ids = []
+    url = f"/api/orders?date_from={date_from}&per_page=2&pagination=cursor"
+    page = client.get(url).json()
+    cursor_ids += [order["id"] for order in page["items"]]
+    while page.get("next_cursor"):
+        page = client.get(f"{url}&cursor={page['next_cursor']}").json()
+        cursor_ids += [order["id"] for order in page["items"]]
+    assert cursor_ids == ids
+
+    # Archived orders can still be read, but not changed
+    response = client.get(f"/api/orders/{ids[-1]}")
+    assert response.status_code == 200
+    assert response.json()["brand"] == "Archive Brand 0"
+    assert client.delete(f"/api/orders/{ids[-1]}").status_code == 404
+
+    # Stats keep counting archived orders
+    assert client.get("/api/orders/stats").json() == totals
+    rebuild_rollups(db_session)
+    db_session.commit()
+    assert client.get("/api/orders/stats").json() == totals
+
+
+def test_archive_walks_keyset(db_session):
+    ids = _add_orders(db_session)
+    status_ids = archive_status_ids(db_session)
+    cutoff = datetime.utcnow() - timedelta(days=365)
+    done = db_session.get(Order, ids[-1]).status_id
+
+    # One order at a time, oldest first, each batch after the previous one
+    walked = []
+    after = None
+    while True:
+        candidates = archive_candidates(db_session, done, cutoff, 1, after)
+        if not candidates:
+            break
+        walked += [order_id for _, order_id in candidates]
+        after = candidates[-1]
+    assert walked == [ids[-1], ids[-3]]
+
+    # Chosen ids that stopped qualifying in between are left alone
+    assert archive_batch(db_session, ids, status_ids, cutoff) == 3
+    assert db_session.query(Order).count() == 2
+    assert archive_batch(db_session, ids, status_ids, cutoff) == 0
+
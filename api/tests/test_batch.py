@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import Order, OrderStatus, VehicleCategory
+from app.replicas import PRIMARY_COOKIE, ReadYourWritesMiddleware
+
+
+def test_batch_runs_operations(client, db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    order_id = client.post("/api/orders", json={
+        "brand": "Batch Brand",
+        "price": 10.0,
+        "vehicle_category_id": category.id,
+        "status_id": status.id
+    }).json()["id"]
+
+    response = client.post("/api/batch", json={"operations": [
+        {"id": "categories", "op": "vehicle_categories"},
+        {"id": "statuses", "op": "statuses"},
+        {"id": "orders", "op": "orders.list",
+         "params": {"status": status.id, "per_page": 10}},
+        {"id": "order", "op": "orders.get", "params": {"order_id": order_id}},
+        {"id": "missing", "op": "orders.get", "params": {"order_id": 0}},
+        {"id": "invalid", "op": "orders.list", "params": {"per_page": 1000}}
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["id"] for result in results] == [
+        "categories", "statuses", "orders", "order", "missing", "invalid"]
+    by_id = {result["id"]: result for result in results}
+
+    # Same bodies as the individual endpoints
+    assert by_id["categories"]["body"] == client.get(
+        "/api/vehicle-categories/").json()
+    assert by_id["statuses"]["body"] == client.get("/api/statuses").json()
+    assert by_id["orders"]["body"] == client.get(
+        f"/api/orders?status={status.id}&per_page=10").json()
+    assert by_id["order"]["body"] == client.get(
+        f"/api/orders/{order_id}").json()
+
+    # Failed operations do not fail the batch
+    assert by_id["missing"]["status"] == 404
+    assert by_id["missing"]["body"] == {"detail": "Order not found"}
+    assert by_id["invalid"]["status"] == 422
+
+    db_session.query(Order).delete()
+    db_session.commit()
+
+
+def test_batch_rejects_unknown_operations(client):
+    response = client.post("/api/batch", json={"operations": [
+        {"op": "orders.delete", "params": {"order_id": 1}}]})
+    assert response.status_code == 422
+    assert client.post("/api/batch", json={"operations": []}).status_code == 422
+
+
+def test_batch_does_not_pin_to_primary(client, db_session):
+    # As deployed with replicas, where writes pin the client to the primary
+    pinning = TestClient(ReadYourWritesMiddleware(app, enabled=True))
+    response = pinning.post("/api/batch", json={"operations": [
+        {"op": "statuses"}, {"op": "orders.list"}]})
+    assert response.status_code == 200
+    assert "set-cookie" not in response.headers
+
+    category = db_session.query(VehicleCategory).first()
+    response = pinning.post("/api/orders", json={
+        "brand": "Batch Brand",
+        "price": 10.0,
+        "vehicle_category_id": category.id,
+        "status_id": db_session.query(OrderStatus).first().id
+    })
+    assert PRIMARY_COOKIE in response.cookies
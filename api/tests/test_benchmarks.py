@@ -0,0 +1,37 @@
+import pytest
+from benchmarks.load import (compare_to_baseline, parse_mix, percentile,
+                             summarize)
+
+
+def test_percentile_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([3.0, 1.0, 2.0], 50) == 2
+    assert percentile([], 99) == 0
+
+
+def test_compare_to_baseline_flags_regressions():
+    baseline = {"operations": {
+        "list": summarize([0.010] * 100, 0, 10),
+        "create": summarize([0.020] * 100, 0, 10)
+    }}
+    results = {"operations": {
+        # Within the allowed 20%
+        "list": summarize([0.011] * 95, 0, 10),
+        # Twice as slow, half the throughput
+        "create": summarize([0.040] * 50, 0, 10),
+        # Not in the baseline, nothing to compare
+        "search": summarize([1.0], 0, 10)
+    }}
+
+    regressions = compare_to_baseline(results, baseline, 0.2)
+    assert regressions == ["create: p95 20.0 -> 40.0 ms",
+                           "create: 10.0 -> 5.0 req/s"]
+
+
+def test_parse_mix():
+    assert parse_mix("list=3,create=1") == {"list": 3.0, "create": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("list=3,unknown=1")
@@ -63,3 +63,21 @@ def test_delete_nonexistent_category(db_session):
     response = client.delete("/api/vehicle-categories/999")
     assert response.status_code == 404
     assert "not found" in response.json()["detail"]
+
+
+def test_get_categories_conditional_request(db_session):
+    response = client.get("/api/vehicle-categories/")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get("/api/vehicle-categories/",
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    # Creating a category changes the cached list and its ETag
+    unique_name = f"Test Category {uuid.uuid4()}"
+    client.post("/api/vehicle-categories/", json={"name": unique_name})
+    response = client.get("/api/vehicle-categories/",
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert unique_name in [category["name"] for category in response.json()]
@@ -0,0 +1,107 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+from app import database
+from app.database import (POOL_SETTINGS, configure_pool_events, pool_settings,
+                          run_db, to_async_url)
+from app.models import OrderStatus, VehicleCategory
+
+
+def test_to_async_url():
+    assert to_async_url(
+        "mysql+pymysql://root:root@db:3306/orders_db?charset=utf8mb4"
+    ) == "mysql+aiomysql://root:root@db:3306/orders_db?charset=utf8mb4"
+    assert to_async_url("sqlite:///test.db") == "sqlite+aiosqlite:///test.db"
+    # Unknown drivers are passed through unchanged
+    assert to_async_url("postgresql+asyncpg://db/orders") == \
+        "postgresql+asyncpg://db/orders"
+
+
+@pytest.mark.asyncio
+async def test_run_db_with_sync_session(db_session):
+    count = await run_db(
+        db_session, lambda db: db.query(OrderStatus).count())
+    assert count > 0
+
+
+def test_pool_settings_split_connection_budget(monkeypatch):
+    for name in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("DB_MAX_CONNECTIONS", "20")
+    monkeypatch.setattr(database, "WEB_CONCURRENCY", 4)
+    settings = pool_settings()
+    assert settings["pool_size"] == 5
+    assert settings["max_overflow"] == 0
+
+    # Explicit sizes win over the budget
+    monkeypatch.setenv("DB_POOL_SIZE", "8")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "2")
+    settings = pool_settings()
+    assert (settings["pool_size"], settings["max_overflow"]) == (8, 2)
+
+
+def test_idle_pre_ping_replaces_dead_connection():
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=1,
+                           max_overflow=0, pool_reset_on_return=None)
+    configure_pool_events(
+        engine, {**POOL_SETTINGS, "pre_ping": "idle", "pre_ping_idle": 0})
+
+    with engine.connect() as conn:
+        dead = conn.connection.connection
+        # Dropped behind the pool's back, like a server-side timeout
+        dead.close()
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        assert conn.connection.connection is not dead
+    engine.dispose()
+
+
+# Run in a fresh interpreter, DB_ASYNC is read when app.database is imported
+ASYNC_APP_SCRIPT = """
+import json, sys
+from fastapi.testclient import TestClient
+from app import database
+from app.main import app
+
+assert database.DB_ASYNC and database.async_engine is not None
+order = json.loads(sys.argv[1])
+with TestClient(app) as client:
+    created = client.post("/api/orders", json=order)
+    listed = client.get("/api/orders?price_from=1234.5&price_to=1234.5")
+print("RESULT", json.dumps({"created": created.status_code, "list": listed.json()}))
+"""
+
+
+def test_async_sessions_serve_requests(db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    # Do not hold SQLite's read lock while the other process writes
+    db_session.rollback()
+    api_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {
+        **os.environ,
+        "DB_ASYNC": "true",
+        # The test database, through its async driver
+        "DATABASE_URL": str(db_session.get_bind().url),
+        "PYTHONPATH": os.pathsep.join(
+            filter(None, [api_dir, os.environ.get("PYTHONPATH")]))
+    }
+    env.pop("ASYNC_DATABASE_URL", None)
+    order = {"brand": "Async Brand", "price": 1234.5,
+             "vehicle_category_id": category.id, "status_id": status.id}
+    result = subprocess.run(
+        [sys.executable, "-c", ASYNC_APP_SCRIPT, json.dumps(order)],
+        cwd=api_dir, env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    # Log records may be written to stdout as well
+    output = json.loads(next(
+        line for line in result.stdout.splitlines()
+        if line.startswith("RESULT "))[len("RESULT "):])
+    assert output["created"] == 200
+    assert output["list"]["total"] == 1
+    assert output["list"]["items"][0]["brand"] == "Async Brand"
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import pytest
+from app.events import (EVENT_CREATED, EVENT_RESET, EVENT_UPDATED, Broker,
+                        EventBus, order_event, order_events)
+from app.models import Order, OrderStatus, VehicleCategory
+
+
+def _order(order_id, status_id, category_id=1):
+    return {"id": order_id, "status_id": status_id,
+            "vehicle_category_id": category_id}
+
+
+async def _next(subscription):
+    event_type, data = await asyncio.wait_for(subscription.get(), 1)
+    return event_type, json.loads(data)
+
+
+def _run(coro):
+    # The loop TestClient runs the app on, pytest-asyncio would replace it
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def test_event_bus_filters_subscribers():
+    _run(_event_bus_filters_subscribers())
+
+
+async def _event_bus_filters_subscribers():
+    bus = EventBus()
+    await bus.start()
+    everything = bus.subscribe()
+    status_one = bus.subscribe(status_id=1)
+    status_two = bus.subscribe(status_id=2, category_id=1)
+
+    bus.publish(order_event(EVENT_CREATED, _order(10, 1)))
+    # Moving an order out of status 2 still reaches status 2 subscribers
+    bus.publish(order_event(EVENT_UPDATED, _order(11, 1),
+                            previous=_order(11, 2)))
+    await asyncio.sleep(0)
+
+    assert [(await _next(everything))[1]["id"] for _ in range(2)] == [10, 11]
+    assert [(await _next(status_one))[1]["id"] for _ in range(2)] == [10, 11]
+    event_type, event = await _next(status_two)
+    assert (event_type, event["id"]) == (EVENT_UPDATED, 11)
+    assert status_two.queue.empty()
+
+    bus.unsubscribe(everything)
+    assert bus.subscriber_count == 2
+    await bus.stop()
+
+
+def test_event_bus_resets_slow_subscriber():
+    _run(_event_bus_resets_slow_subscriber())
+
+
+async def _event_bus_resets_slow_subscriber():
+    bus = EventBus(queue_size=2)
+    await bus.start()
+    slow = bus.subscribe()
+    for order_id in range(3):
+        bus.publish(order_event(EVENT_CREATED, _order(order_id, 1)))
+    await asyncio.sleep(0)
+
+    # The backlog is dropped in favour of a single reset
+    assert (await _next(slow))[0] == EVENT_RESET
+    assert slow.queue.empty()
+    assert bus.subscriber_count == 0
+    await bus.stop()
+
+
+def test_order_writes_publish_events(client, db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    # Bind the bus to the loop the client runs requests on
+    _run(order_events.start())
+    subscription = order_events.subscribe(status_id=status.id)
+    try:
+        response = client.post("/api/orders", json={
+            "brand": "Event Brand",
+            "price": 10.0,
+            "vehicle_category_id": category.id,
+            "status_id": status.id
+        })
+        order_id = response.json()["id"]
+        client.patch(f"/api/orders/{order_id}", json={"price": 20.0})
+        client.delete(f"/api/orders/{order_id}")
+
+        events = [_run(_next(subscription)) for _ in range(3)]
+        assert [event_type for event_type, _ in events] == [
+            "order.created", "order.updated", "order.deleted"]
+        assert {event["id"] for _, event in events} == {order_id}
+        assert events[1][1]["order"]["price"] == 20.0
+    finally:
+        order_events.unsubscribe(subscription)
+        db_session.query(Order).delete()
+        db_session.commit()
+
+
+def test_broker_must_implement_publish():
+    class IncompleteBroker(Broker):
+        async def start(self, deliver):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteBroker()
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+import time
+from init_db import SEED_DAYS, generate_orders
+
+STATUSES = {"Nové": 1, "Vybavené": 2, "Vybavuje sa": 3, "Stornované": 4}
+CATEGORIES = {"LKW": 1, "PKW": 2}
+
+
+def test_generate_orders_in_chunks():
+    now = datetime(2024, 6, 1, 12, 0)
+    chunks = list(generate_orders(2500, STATUSES, CATEGORIES,
+                                  chunk_size=1000, now=now))
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+
+    rows = [row for chunk in chunks for row in chunk]
+    for brand, price, category_id, status_id, created_at, version in rows:
+        assert brand
+        assert price > 0
+        assert category_id in CATEGORIES.values()
+        assert status_id in STATUSES.values()
+        assert now - timedelta(days=SEED_DAYS) <= created_at <= now
+        assert version == 1
+
+    # Orders older than a month are mostly done
+    old = [row[3] for row in rows if row[4] < now - timedelta(days=30)]
+    done = sum(status_id == STATUSES["Vybavené"] for status_id in old)
+    assert done > len(old) / 2
+
+
+def test_generate_orders_in_utc(monkeypatch):
+    # created_at is stored in UTC, the containers run in local time
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    try:
+        rows = next(generate_orders(10000, STATUSES, CATEGORIES,
+                                    chunk_size=10000))
+        assert max(row[4] for row in rows) <= datetime.utcnow()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
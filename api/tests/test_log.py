@@ -0,0 +1,44 @@
+import json
+import logging
+import time
+from app import log
+from app.log import JsonFormatter, log_request, parse_sample_rates
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("orders.list=0.1, *=1,bad,x=y,big=5") == {
+        "orders.list": 0.1,
+        "*": 1.0,
+        "big": 1.0
+    }
+
+
+def test_log_request_single_summary(caplog, monkeypatch):
+    monkeypatch.setattr(log, "SAMPLE_RATES", {"*": 1.0})
+    with caplog.at_level(logging.INFO, logger=log.REQUEST_LOGGER):
+        log_request("orders.list", time.perf_counter(), rows=20)
+
+    records = [record for record in caplog.records
+               if record.name == log.REQUEST_LOGGER]
+    assert len(records) == 1
+    assert records[0].fields["rows"] == 20
+    assert "duration_ms" in records[0].fields
+
+
+def test_log_request_sampled_out(caplog, monkeypatch):
+    monkeypatch.setattr(log, "SAMPLE_RATES", {"orders.list": 0.0, "*": 1.0})
+    with caplog.at_level(logging.INFO, logger=log.REQUEST_LOGGER):
+        log_request("orders.list", time.perf_counter(), rows=20)
+    assert not [record for record in caplog.records
+                if record.name == log.REQUEST_LOGGER]
+
+
+def test_json_formatter():
+    record = logging.LogRecord(
+        "app.requests", logging.INFO, __file__, 1, "%s", ("orders.list",),
+        None)
+    record.fields = {"rows": 3}
+    payload = json.loads(JsonFormatter().format(record))
+    assert payload["msg"] == "orders.list"
+    assert payload["fields"] == {"rows": 3}
+    assert payload["level"] == "INFO"
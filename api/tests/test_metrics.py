@@ -0,0 +1,51 @@
+from app.metrics import Counter, Histogram, Registry
+
+
+def test_server_timing_header(client):
+    response = client.get("/api/orders")
+    assert response.status_code == 200
+    server_timing = response.headers["server-timing"]
+    assert server_timing.startswith("app;dur=")
+    assert "db;dur=" in server_timing
+    # The count and the page query at least
+    queries = int(server_timing.split('desc="')[1].split(" ")[0])
+    assert queries >= 2
+
+
+def test_metrics_endpoint(client):
+    client.get("/api/orders")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/orders",status="200"}' in body
+    assert "db_queries_total" in body
+    assert 'http_request_db_queries_bucket{route="/api/orders",le="+Inf"}' in body
+    assert 'db_pool_connections{state="checked_out",engine="primary"}' in body
+
+
+def test_pool_stats_endpoint(client):
+    response = client.get("/api/health/pool")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["settings"]["pool_size"] >= 1
+    assert set(data["pools"]["primary"]) >= {
+        "size", "checked_out", "overflow", "idle", "avg_checkout_wait_ms"}
+
+
+def test_histogram_render():
+    registry = Registry()
+    histogram = registry.register(
+        Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1)))
+    counter = registry.register(Counter("hits_total", "Hits"))
+    histogram.observe(0.05, ("/a",))
+    histogram.observe(0.5, ("/a",))
+    histogram.observe(5, ("/a",))
+    counter.inc()
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert "hits_total 1" in lines
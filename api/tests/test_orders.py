@@ -3,8 +3,11 @@ from fastapi.testclient import TestClient
 from app.main import app
 from app.database import engine, Base
 from app.models import Order, OrderStatus, VehicleCategory
+from app.routes.orders import PaginatedResponse
 from sqlalchemy.orm import Session
+import json
 import time
+from datetime import datetime, timedelta
 
 # Create test client
 client = TestClient(app)
@@ -174,3 +177,392 @@ def test_delete_order(client, db_session):
     # Then delete only the category
     db_session.delete(category)
     db_session.commit()
+
+
+def test_get_orders_cursor_pagination(client, db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+
+    # Orders sharing created_at must still be paged by the id tie-breaker
+    created_at = datetime(2024, 3, 20, 10, 0, 0)
+    orders = [
+        Order(
+            brand=f"Cursor Brand {i}",
+            price=100.0 * i,
+            vehicle_category_id=category.id,
+            status_id=status.id,
+            created_at=created_at if i < 3 else created_at + timedelta(days=i)
+        )
+        for i in range(5)
+    ]
+    db_session.add_all(orders)
+    db_session.commit()
+    expected_ids = [order.id for order in sorted(
+        orders, key=lambda o: (o.created_at, o.id), reverse=True)]
+
+    seen_ids = []
+    pages = []
+    response = client.get("/api/orders?pagination=cursor&per_page=2")
+    while True:
+        assert response.status_code == 200
+        data = response.json()
+        assert data["page"] is None
+        pages.append(data)
+        seen_ids.extend(item["id"] for item in data["items"])
+        if not data["next_cursor"]:
+            break
+        response = client.get(
+            f"/api/orders?per_page=2&cursor={data['next_cursor']}")
+
+    assert seen_ids == expected_ids
+    assert pages[0]["prev_cursor"] is None
+
+    # Walking back from the last page returns the previous page
+    response = client.get(
+        f"/api/orders?per_page=2&cursor={pages[-1]['prev_cursor']}")
+    assert response.status_code == 200
+    assert response.json()["items"] == pages[-2]["items"]
+
+    db_session.query(Order).delete()
+    db_session.commit()
+
+
+def test_get_orders_invalid_cursor(client, db_session):
+    response = client.get("/api/orders?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_get_orders_total_modes(client, db_session):
+    response = client.get("/api/orders?total_mode=none")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] is None
+    assert data["total_pages"] is None
+    assert data["total_mode"] == "none"
+
+    response = client.get("/api/orders?total_mode=estimate")
+    assert response.status_code == 200
+    assert isinstance(response.json()["total"], int)
+
+    response = client.get("/api/orders?total_mode=bogus")
+    assert response.status_code == 422
+
+
+def test_cached_total_invalidated_on_write(client, db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    order_data = {
+        "brand": "Count Brand",
+        "price": 10.0,
+        "vehicle_category_id": category.id,
+        "status_id": status.id
+    }
+
+    # Prime the cache for this filter set
+    total = client.get("/api/orders?search=Count").json()["total"]
+
+    response = client.post("/api/orders", json=order_data)
+    assert response.status_code == 200
+    order_id = response.json()["id"]
+    assert client.get(
+        "/api/orders?search=Count").json()["total"] == total + 1
+
+    client.delete(f"/api/orders/{order_id}")
+    assert client.get("/api/orders?search=Count").json()["total"] == total
+
+
+def test_search_orders_by_brand(client, db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    for brand in ["Škoda", "Mercedes-Benz", "BMW"]:
+        db_session.add(Order(brand=brand, price=100.0,
+                             vehicle_category_id=category.id,
+                             status_id=status.id))
+    db_session.commit()
+
+    response = client.get("/api/orders?search=Škoda")
+    assert [item["brand"] for item in response.json()["items"]] == ["Škoda"]
+
+    # Substring and case-insensitive matches keep working
+    response = client.get("/api/orders?search=koda")
+    assert [item["brand"] for item in response.json()["items"]] == ["Škoda"]
+    response = client.get("/api/orders?search=benz")
+    assert [item["brand"] for item in response.json()["items"]] == [
+        "Mercedes-Benz"]
+
+    # Single characters are shorter than an ngram token
+    response = client.get("/api/orders?search=W")
+    assert [item["brand"] for item in response.json()["items"]] == ["BMW"]
+
+    db_session.query(Order).delete()
+    db_session.commit()
+
+
+def test_bulk_create_orders_ndjson(client, db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    valid = {
+        "brand": "Bulk Brand",
+        "price": 100.0,
+        "vehicle_category_id": category.id,
+        "status_id": status.id
+    }
+    lines = [
+        json.dumps(valid),
+        json.dumps({**valid, "price": -1}),
+        "{not json",
+        json.dumps(valid),
+        json.dumps(valid)
+    ]
+
+    response = client.post(
+        "/api/orders/bulk?batch_size=2",
+        data="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["received"] == 5
+    assert data["inserted"] == 3
+    assert data["failed"] == 2
+    assert [error["index"] for error in data["errors"]] == [1, 2]
+    assert db_session.query(Order).filter(
+        Order.brand == "Bulk Brand").count() == 3
+
+    db_session.query(Order).delete()
+    db_session.commit()
+
+
+def test_bulk_create_orders_json_array(client, db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    orders = [
+        {
+            "brand": f"Array Brand {i}",
+            "price": 10.0 * i,
+            "vehicle_category_id": category.id,
+            "status_id": status.id
+        }
+        for i in range(5)
+    ]
+
+    response = client.post("/api/orders/bulk", json=orders)
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 5
+    assert client.get("/api/orders?search=Array").json()["total"] == 5
+
+    response = client.post("/api/orders/bulk", json={"brand": "x"})
+    assert response.status_code == 400
+
+    db_session.query(Order).delete()
+    db_session.commit()
+
+
+def test_export_orders(client, db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    for i in range(3):
+        db_session.add(Order(brand=f"Export Brand {i}", price=10.0 * i,
+                             vehicle_category_id=category.id,
+                             status_id=status.id,
+                             created_at=datetime(2024, 3, 20 + i)))
+    db_session.add(Order(brand="Other Brand", price=1.0,
+                         vehicle_category_id=category.id,
+                         status_id=status.id))
+    db_session.commit()
+
+    response = client.get("/api/orders/export?search=Export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["brand"] for row in rows] == [
+        "Export Brand 2", "Export Brand 1", "Export Brand 0"]
+    assert rows[0]["created_at"] == "2024-03-22T00:00:00"
+
+    response = client.get("/api/orders/export?format=csv&search=Export")
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "id,brand,price,vehicle_category_id,status_id,created_at"
+    assert len(lines) == 4
+
+    db_session.query(Order).delete()
+    db_session.commit()
+
+
+def test_batch_get_update_delete_orders(client, db_session):
+    statuses = db_session.query(OrderStatus).order_by(OrderStatus.id).all()
+    category = db_session.query(VehicleCategory).first()
+    # Through the API, so the rollups checked below are maintained
+    client.post("/api/orders/bulk", json=[
+        {"brand": f"Batch Brand {i}", "price": 10.0 * (i + 1),
+         "vehicle_category_id": category.id, "status_id": statuses[0].id}
+        for i in range(3)
+    ])
+    ids = [order.id for order in db_session.query(Order).order_by(Order.id)]
+    missing_id = max(ids) + 1000
+
+    response = client.post("/api/orders/batch/get",
+                           json={"ids": [ids[2], missing_id, ids[0]]})
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [ids[2], ids[0]]
+    assert data["missing"] == [missing_id]
+
+    response = client.post("/api/orders/batch/update", json={
+        "ids": ids[:2] + [missing_id],
+        "changes": {"status_id": statuses[1].id}
+    })
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == [
+        "updated", "updated", "not_found"]
+    db_session.expire_all()
+    assert [db_session.get(Order, order_id).status_id for order_id in ids] == [
+        statuses[1].id, statuses[1].id, statuses[0].id]
+    # Only the sent fields change
+    assert db_session.get(Order, ids[0]).brand == "Batch Brand 0"
+
+    stats = client.get("/api/orders/stats?group_by=status").json()
+    assert {group["status_id"]: group["count"]
+            for group in stats["groups"]} == {
+        statuses[0].id: 1, statuses[1].id: 2}
+
+    response = client.post("/api/orders/batch/update", json={
+        "ids": ids, "changes": {"price": None}})
+    assert response.status_code == 422
+
+    response = client.post("/api/orders/batch/delete",
+                           json={"ids": [ids[0], missing_id]})
+    assert [result["status"] for result in response.json()["results"]] == [
+        "deleted", "not_found"]
+    assert client.get("/api/orders").json()["total"] == 2
+
+    db_session.query(Order).delete()
+    db_session.commit()
+
+
+def test_patch_order(client, db_session):
+    statuses = db_session.query(OrderStatus).order_by(OrderStatus.id).all()
+    category = db_session.query(VehicleCategory).first()
+    order = client.post("/api/orders", json={
+        "brand": "Patch Brand",
+        "price": 100.0,
+        "vehicle_category_id": category.id,
+        "status_id": statuses[0].id
+    }).json()
+    assert order["version"] == 1
+
+    response = client.get(f"/api/orders/{order['id']}")
+    etag = response.headers["etag"]
+    assert etag == '"1"'
+
+    # Only the sent field changes
+    response = client.patch(f"/api/orders/{order['id']}",
+                            json={"status_id": statuses[1].id},
+                            headers={"If-Match": etag})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status_id"] == statuses[1].id
+    assert data["brand"] == "Patch Brand"
+    assert data["price"] == 100.0
+    assert data["version"] == 2
+    assert response.headers["etag"] == '"2"'
+
+    # A writer holding the old version is rejected instead of overwriting
+    response = client.patch(f"/api/orders/{order['id']}",
+                            json={"status_id": statuses[2].id},
+                            headers={"If-Match": etag})
+    assert response.status_code == 412
+    assert response.headers["etag"] == '"2"'
+    response = client.put(f"/api/orders/{order['id']}", json={
+        "brand": "Patch Brand",
+        "price": 100.0,
+        "vehicle_category_id": category.id,
+        "status_id": statuses[2].id
+    }, headers={"If-Match": etag})
+    assert response.status_code == 412
+
+    # Without If-Match the update is unconditional
+    response = client.patch(f"/api/orders/{order['id']}",
+                            json={"price": 150.0})
+    assert response.json()["version"] == 3
+
+    response = client.patch(f"/api/orders/{order['id']}",
+                            json={"brand": None})
+    assert response.status_code == 422
+    response = client.patch("/api/orders/999999", json={"price": 1.0})
+    assert response.status_code == 404
+
+    stats = client.get("/api/orders/stats?group_by=status").json()
+    assert stats["groups"] == [{
+        "status_id": statuses[1].id, "count": 1, "sum": 150.0,
+        "min": 150.0, "max": 150.0, "avg": 150.0}]
+
+    db_session.query(Order).delete()
+    db_session.commit()
+
+
+def test_get_orders_fast_path_matches_schema(client, db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    db_session.add(Order(brand="Fast Brand", price=12.5,
+                         vehicle_category_id=category.id,
+                         status_id=status.id,
+                         created_at=datetime(2024, 3, 20, 8, 15, 30)))
+    db_session.commit()
+
+    data = client.get("/api/orders").json()
+    # Same document the response model would have produced
+    assert PaginatedResponse.parse_obj(data).dict() == {
+        **data, "items": [{**item, "created_at": datetime.fromisoformat(
+            item["created_at"])} for item in data["items"]]}
+    assert data["items"][0]["created_at"] == "2024-03-20T08:15:30"
+    assert data["items"][0]["version"] == 1
+
+    db_session.query(Order).delete()
+    db_session.commit()
+
+
+def test_conditional_get_orders(client, db_session):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    order_data = {
+        "brand": "Etag Brand",
+        "price": 10.0,
+        "vehicle_category_id": category.id,
+        "status_id": status.id
+    }
+    order_id = client.post("/api/orders", json=order_data).json()["id"]
+
+    response = client.get("/api/orders?search=Etag")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+    response = client.get("/api/orders?search=Etag",
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+    # Different parameters have their own ETag
+    assert client.get("/api/orders?search=Etag&per_page=5").headers[
+        "etag"] != etag
+
+    # Any write changes it
+    client.post("/api/orders", json=order_data)
+    response = client.get("/api/orders?search=Etag",
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["total"] == 2
+
+    response = client.get(f"/api/orders/{order_id}")
+    etag = response.headers["etag"]
+    response = client.get(f"/api/orders/{order_id}",
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    client.patch(f"/api/orders/{order_id}", json={"price": 20.0})
+    response = client.get(f"/api/orders/{order_id}",
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["price"] == 20.0
+
+    db_session.query(Order).delete()
+    db_session.commit()
@@ -0,0 +1,163 @@
+from datetime import date, datetime
+import pytest
+from sqlalchemy import event
+from app.http_cache import order_list_cache
+from app.models import (ArchivedOrder, Order, OrderDailyRollup, OrderStatus,
+                        VehicleCategory)
+from app.rollups import rebuild_rollups
+from app.routes import orders
+from app.partitions import (add_months, month_range, partition_definitions,
+                            pruning_bound)
+
+
+def test_partition_definitions():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    months = month_range(date(2024, 11, 17), date(2025, 1, 1))
+    assert months == [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)]
+    assert partition_definitions(months[:2]) == (
+        "PARTITION p202411 VALUES LESS THAN ('2024-12-01'), "
+        "PARTITION p202412 VALUES LESS THAN ('2025-01-01'), "
+        "PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+
+
+def test_pruning_bound(db_session):
+    # 10 orders a day with status 1 and 5 with status 2, for 1-10 March
+    for day in range(1, 11):
+        for status_id, count in ((1, 10), (2, 5)):
+            db_session.add(OrderDailyRollup(
+                day=date(2024, 3, day), status_id=status_id,
+                vehicle_category_id=1, brand="Bound Brand",
+                order_count=count, price_sum=count, price_min=1,
+                price_max=1))
+    db_session.flush()
+
+    # The first page of 20 fits into the last two days
+    assert pruning_bound(db_session, {}, 20) == datetime(2024, 3, 9)
+    assert pruning_bound(db_session, {"status_id": 2}, 20) == \
+        datetime(2024, 3, 7)
+    # Rows on the cursor's own day may be after it, those are not counted
+    assert pruning_bound(db_session, {}, 20, before=datetime(
+        2024, 3, 9, 12)) == datetime(2024, 3, 7)
+    # Not enough orders, no bound needed
+    assert pruning_bound(db_session, {}, 1000) is None
+    # Brand search cannot be counted from the rollups
+    assert pruning_bound(db_session, {"search": "Bound"}, 20) is None
+
+
+def test_list_orders_bounded_when_partitioned(client, db_session,
+                                              monkeypatch):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    for day in range(1, 11):
+        for hour in range(3):
+            db_session.add(Order(
+                brand="Bound Brand", price=day, status_id=status.id,
+                vehicle_category_id=category.id,
+                created_at=datetime(2024, 3, day, hour)))
+    db_session.flush()
+    rebuild_rollups(db_session)
+    db_session.commit()
+
+    unbounded = client.get("/api/orders?page=2&per_page=4").json()
+    first = client.get("/api/orders?pagination=cursor&per_page=4").json()
+    second = client.get(f"/api/orders?pagination=cursor&per_page=4"
+                        f"&cursor={first['next_cursor']}").json()
+
+    monkeypatch.setattr(orders, "ORDER_PARTITIONS", True)
+    bounds = []
+
+    def record(*args, **kwargs):
+        bounds.append(pruning_bound(*args, **kwargs))
+        return bounds[-1]
+
+    monkeypatch.setattr(orders, "pruning_bound", record)
+    order_list_cache.clear()
+    assert client.get("/api/orders?page=2&per_page=4").json() == unbounded
+    assert client.get(f"/api/orders?pagination=cursor&per_page=4"
+                      f"&cursor={first['next_cursor']}").json() == second
+    # Page 2 needs 8 rows: the last three days. The cursor page only
+    # counts the days before the cursor's day.
+    assert bounds == [datetime(2024, 3, 8), datetime(2024, 3, 7)]
+
+    db_session.query(Order).delete()
+    db_session.commit()
+
+
+@pytest.fixture
+def without_foreign_keys(db_session):
+    # Like a partitioned orders table. SQLite does not enforce them anyway.
+    engine = db_session.get_bind()
+
+    def disable_checks(dbapi_connection, connection_record,
+                       connection_proxy):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+        finally:
+            cursor.close()
+
+    if engine.dialect.name == "mysql":
+        db_session.close()
+        event.listen(engine, "checkout", disable_checks)
+    yield
+    if engine.dialect.name == "mysql":
+        event.remove(engine, "checkout", disable_checks)
+        # Drop the connections that still have the checks disabled
+        engine.dispose()
+
+
+def test_lookup_ids_checked_without_foreign_keys(client, db_session,
+                                                 without_foreign_keys):
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    valid = {"brand": "Reference Brand", "price": 10.0,
+             "vehicle_category_id": category.id, "status_id": status.id}
+
+    response = client.post("/api/orders", json={**valid, "status_id": 9999})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown status_id: 9999"
+
+    response = client.post("/api/orders/bulk", json=[
+        valid, {**valid, "vehicle_category_id": 9999}, valid])
+    assert response.json()["inserted"] == 2
+    assert response.json()["errors"] == [
+        {"index": 1, "errors": ["Unknown vehicle_category_id: 9999"]}]
+
+    order_id = client.post("/api/orders", json=valid).json()["id"]
+    assert client.put(f"/api/orders/{order_id}", json={
+        **valid, "status_id": 9999}).status_code == 400
+    assert client.patch(f"/api/orders/{order_id}", json={
+        "vehicle_category_id": 9999}).status_code == 400
+    assert client.post("/api/orders/batch/update", json={
+        "ids": [order_id], "changes": {"status_id": 9999}
+    }).status_code == 400
+    assert db_session.query(Order).filter(
+        Order.status_id == 9999).count() == 0
+    assert db_session.query(Order).filter(
+        Order.vehicle_category_id == 9999).count() == 0
+
+    # Lookups used only by archived orders cannot be deleted either
+    new_status = client.post("/api/statuses", json={
+        "status": "Reference Status"}).json()
+    new_category = client.post("/api/vehicle-categories/", json={
+        "name": "Reference Category"}).json()
+    db_session.add(ArchivedOrder(
+        id=order_id + 1000, brand="Archived Brand", price=1.0,
+        status_id=new_status["id"], vehicle_category_id=new_category["id"],
+        created_at=datetime(2020, 1, 1), version=1,
+        archived_at=datetime(2021, 1, 1)))
+    db_session.commit()
+    assert client.delete(
+        f"/api/statuses/{new_status['id']}").status_code == 400
+    assert client.delete(
+        f"/api/vehicle-categories/{new_category['id']}").status_code == 400
+
+    db_session.query(ArchivedOrder).delete()
+    db_session.commit()
+    assert client.delete(
+        f"/api/statuses/{new_status['id']}").status_code == 200
+    assert client.delete(
+        f"/api/vehicle-categories/{new_category['id']}").status_code == 200
+    db_session.query(Order).delete()
+    db_session.commit()
@@ -0,0 +1,55 @@
+from app import probe
+from app.probe import PRIMARY, HealthProbe, check_pools
+from app.startup import warmup
+
+
+def test_check_pools(monkeypatch):
+    monkeypatch.setattr(probe, "pool_status", lambda: {
+        "primary": {"size": 5, "checked_out": 2},
+        "replica0": {"size": 5, "checked_out": 14}
+    })
+    monkeypatch.setitem(probe.POOL_SETTINGS, "max_overflow", 10)
+    result = check_pools(saturation=0.9)
+    assert result["usage"] == {"primary": 0.133, "replica0": 0.933}
+    assert not result["ok"]
+    assert check_pools(saturation=0.95)["ok"]
+
+
+def test_readiness_from_cached_probe(client, event_loop, monkeypatch):
+    health_probe = HealthProbe({PRIMARY: probe.health_probe.engines[PRIMARY]})
+    assert not health_probe.readiness()[0]
+
+    monkeypatch.setattr(warmup, "ready", True)
+    event_loop.run_until_complete(health_probe.check())
+    ready, report = health_probe.readiness()
+    assert ready
+    assert report["checks"][PRIMARY]["ok"]
+    assert report["checks"]["pool"]["ok"]
+
+    # A replica down is fine while another one works
+    health_probe.checks["replica0"] = {"ok": False, "error": "down"}
+    health_probe.checks["replica1"] = {"ok": True}
+    assert health_probe.readiness()[0]
+    health_probe.checks["replica1"] = {"ok": False, "error": "lagging"}
+    assert not health_probe.readiness()[0]
+
+    # Results of a probe that stopped running are not trusted
+    del health_probe.checks["replica0"], health_probe.checks["replica1"]
+    health_probe.checked_at -= health_probe.interval * 3 + 1
+    assert not health_probe.readiness()[0]
+
+
+def test_live_and_ready_endpoints(client, monkeypatch):
+    assert client.get("/live").json() == {"status": "ok"}
+
+    monkeypatch.setattr(probe.HealthProbe, "healthy", property(
+        lambda self: False))
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert not response.json()["ready"]
+    assert not client.get("/api/health").json()["ready"]
+
+    monkeypatch.setattr(probe.HealthProbe, "healthy", property(
+        lambda self: True))
+    monkeypatch.setattr(warmup, "ready", True)
+    assert client.get("/ready").status_code == 200
@@ -0,0 +1,117 @@
+import time
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, select
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.requests import Request
+from app import replicas
+from app.replicas import (PRIMARY_COOKIE, ReadYourWritesMiddleware,
+                          get_read_db, read_session_factory,
+                          reads_from_primary)
+
+
+def _request(cookie: str = "") -> Request:
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    return Request({"type": "http", "method": "GET", "headers": headers})
+
+
+def test_read_session_factory_prefers_replicas(monkeypatch):
+    # A second database stands in for the replica
+    replica = sessionmaker(bind=create_engine("sqlite://"))
+    monkeypatch.setattr(replicas, "ReplicaSessions", [replica])
+    primary = replicas.SessionLocal
+
+    assert read_session_factory(_request()) is replica
+
+    # Inside the read-your-writes window reads go to the primary
+    fresh = f"{PRIMARY_COOKIE}={time.time() + 5}"
+    assert reads_from_primary(_request(fresh))
+    assert read_session_factory(_request(fresh)) is primary
+
+    expired = f"{PRIMARY_COOKIE}={time.time() - 1}"
+    assert read_session_factory(_request(expired)) is replica
+    assert read_session_factory(_request(f"{PRIMARY_COOKIE}=x")) is replica
+
+
+def test_read_session_factory_without_replicas(monkeypatch):
+    monkeypatch.setattr(replicas, "ReplicaSessions", [])
+    assert read_session_factory(_request()) is replicas.SessionLocal
+
+
+def test_writes_pin_client_to_primary():
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, enabled=True)
+
+    @app.get("/items")
+    def read_items():
+        return []
+
+    @app.post("/items")
+    def create_item():
+        return {}
+
+    @app.delete("/items")
+    def delete_items():
+        raise HTTPException(status_code=404)
+
+    client = TestClient(app)
+    assert PRIMARY_COOKIE not in client.get("/items").cookies
+    # Failed writes changed nothing, no need to pin
+    assert PRIMARY_COOKIE not in client.delete("/items").cookies
+
+    response = client.post("/items")
+    until = float(response.cookies[PRIMARY_COOKIE])
+    # The cookie value is rounded to milliseconds
+    assert time.time() < until <= \
+        time.time() + replicas.READ_YOUR_WRITES_SECONDS + 0.001
+
+
+def test_reads_after_write_see_it(tmp_path, monkeypatch):
+    # Two separate databases, the replica never receives the write
+    metadata = MetaData()
+    items = Table("items", metadata, Column("id", Integer, primary_key=True))
+    factories = []
+    for name in ("primary", "replica"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}.db",
+                               connect_args={"check_same_thread": False})
+        metadata.create_all(engine)
+        factories.append(sessionmaker(bind=engine))
+    primary, replica = factories
+    monkeypatch.setattr(replicas, "SessionLocal", primary)
+    monkeypatch.setattr(replicas, "ReplicaSessions", [replica])
+
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, enabled=True,
+                       read_only_paths={"/items/search"})
+
+    def _ids(db: Session):
+        return list(db.execute(select(items.c.id)).scalars())
+
+    @app.get("/items")
+    def read_items(db: Session = Depends(get_read_db)):
+        return _ids(db)
+
+    @app.post("/items/search")
+    def search_items(db: Session = Depends(get_read_db)):
+        return _ids(db)
+
+    @app.post("/items")
+    def create_item():
+        db = primary()
+        try:
+            db.execute(items.insert().values(id=1))
+            db.commit()
+        finally:
+            db.close()
+        return {}
+
+    reader = TestClient(app)
+    # A read-only POST does not pin the client
+    assert reader.post("/items/search").json() == []
+    assert PRIMARY_COOKIE not in reader.cookies
+
+    writer = TestClient(app)
+    writer.post("/items")
+    assert writer.get("/items").json() == [1]
+    # Other clients still read the lagging replica
+    assert reader.get("/items").json() == []
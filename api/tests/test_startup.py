@@ -0,0 +1,42 @@
+import pytest
+from app import schema
+from app.lookup_cache import lookup_cache
+from app.schema import SchemaVersionError, check_schema_version
+from app.startup import Warmup, warmup as app_warmup
+
+
+def test_check_schema_version(db_session, monkeypatch):
+    conn = db_session.connection()
+    assert check_schema_version(conn) == schema.SCHEMA_VERSION
+    monkeypatch.setattr(schema, "SCHEMA_VERSION", schema.SCHEMA_VERSION + 1)
+    with pytest.raises(SchemaVersionError):
+        check_schema_version(conn)
+
+
+def test_warmup(client, event_loop, monkeypatch):
+    # The client fixture points the app's warm-up at the test database
+    warmup = Warmup(app_warmup.engine, app_warmup.session_factory,
+                    retry_interval=0)
+    event_loop.run_until_complete(warmup.warm_up())
+    assert lookup_cache.get("statuses") is not None
+    assert lookup_cache.get("vehicle_categories") is not None
+
+    # Not ready while the database is behind the code, retried until the
+    # migration ran
+    monkeypatch.setattr(schema, "SCHEMA_VERSION", schema.SCHEMA_VERSION + 1)
+    attempts = []
+
+    def migrate():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise RuntimeError("Database not ready")
+        monkeypatch.setattr(schema, "SCHEMA_VERSION",
+                            schema.SCHEMA_VERSION - 1)
+
+    event_loop.run_until_complete(warmup.start(migrate))
+    assert not warmup.ready
+    event_loop.run_until_complete(warmup._task)
+    assert warmup.ready and warmup.error is None
+    assert len(attempts) == 2
+
+    assert client.get("/api/health").json()["ready"]
@@ -0,0 +1,154 @@
+from sqlalchemy import event
+from app.models import Order, OrderDailyRollup, OrderStatus, VehicleCategory
+from app import search
+from app.rollups import rebuild_rollups
+from app.stats import rollup_compatible
+
+
+def _rollup_rows(session):
+    return sorted(
+        (row.day, row.status_id, row.vehicle_category_id, row.brand,
+         row.order_count, round(row.price_sum, 2), row.price_min,
+         row.price_max)
+        for row in session.query(OrderDailyRollup).all()
+    )
+
+
+def test_order_stats_follow_writes(client, db_session):
+    statuses = db_session.query(OrderStatus).order_by(OrderStatus.id).all()
+    category = db_session.query(VehicleCategory).first()
+    created = []
+    for price, status in [(100.0, statuses[0]), (300.0, statuses[0]),
+                          (50.0, statuses[1])]:
+        response = client.post("/api/orders", json={
+            "brand": "Stats Brand",
+            "price": price,
+            "vehicle_category_id": category.id,
+            "status_id": status.id
+        })
+        created.append(response.json())
+    client.post("/api/orders/bulk", json=[{
+        "brand": "Stats Brand",
+        "price": 200.0,
+        "vehicle_category_id": category.id,
+        "status_id": statuses[0].id
+    }])
+
+    # Move the most expensive order to the other status, drop the cheapest
+    client.put(f"/api/orders/{created[1]['id']}", json={
+        "brand": "Stats Brand",
+        "price": 300.0,
+        "vehicle_category_id": category.id,
+        "status_id": statuses[1].id
+    })
+    client.delete(f"/api/orders/{created[2]['id']}")
+
+    response = client.get("/api/orders/stats?group_by=status&interval=month")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["source"] == "rollup"
+    assert data["totals"] == {
+        "count": 3, "sum": 600.0, "min": 100.0, "max": 300.0, "avg": 200.0}
+    by_status = {group["status_id"]: group for group in data["groups"]}
+    assert by_status[statuses[0].id]["count"] == 2
+    assert by_status[statuses[0].id]["max"] == 200.0
+    assert by_status[statuses[1].id]["min"] == 300.0
+    assert len(data["series"]) == 1
+    assert data["series"][0]["count"] == 3
+
+    # A price filter is answered from the orders table, with the same result
+    fallback = client.get(
+        "/api/orders/stats?group_by=status&interval=month&price_from=0").json()
+    assert fallback["source"] == "orders"
+    assert fallback["totals"] == data["totals"]
+    assert fallback["groups"] == data["groups"]
+    assert fallback["series"] == data["series"]
+
+    # The incrementally maintained rows match a full rebuild
+    maintained = _rollup_rows(db_session)
+    rebuild_rollups(db_session)
+    db_session.flush()
+    assert _rollup_rows(db_session) == maintained
+    db_session.rollback()
+
+    db_session.query(Order).delete()
+    db_session.query(OrderDailyRollup).delete()
+    db_session.commit()
+
+
+def test_batch_writes_refresh_rollups_set_based(client, db_session):
+    statuses = db_session.query(OrderStatus).order_by(OrderStatus.id).all()
+    categories = db_session.query(VehicleCategory).all()
+    client.post("/api/orders/bulk", json=[
+        {"brand": f"Rollup Brand {i % 4}", "price": 10.0 * (i + 1),
+         "vehicle_category_id": categories[i % 2].id,
+         "status_id": statuses[i % 3].id}
+        for i in range(12)
+    ])
+    ids = [order.id for order in db_session.query(Order).order_by(Order.id)]
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "order_rollups_daily" in statement:
+            statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        # Twelve old and four new buckets, one DELETE and one INSERT for all
+        response = client.post("/api/orders/batch/update", json={
+            "ids": ids, "changes": {"status_id": statuses[3].id}})
+        assert response.status_code == 200
+        assert len(statements) == 2
+        statements.clear()
+        response = client.post("/api/orders/batch/delete",
+                               json={"ids": ids[::2]})
+        assert response.status_code == 200
+        assert len(statements) == 2
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    db_session.expire_all()
+    maintained = _rollup_rows(db_session)
+    assert sum(row[4] for row in maintained) == 6
+    rebuild_rollups(db_session)
+    db_session.flush()
+    assert _rollup_rows(db_session) == maintained
+    db_session.rollback()
+
+    db_session.query(Order).delete()
+    db_session.query(OrderDailyRollup).delete()
+    db_session.commit()
+
+
+def test_order_stats_rejects_unknown_group(client):
+    response = client.get("/api/orders/stats?group_by=colour")
+    assert response.status_code == 400
+    response = client.get("/api/orders/stats?interval=year")
+    assert response.status_code == 422
+
+
+def test_search_stats_match_order_list(client, db_session, monkeypatch):
+    # FULLTEXT matching needs the orders index, the rollups only do LIKE
+    monkeypatch.setattr(search, "SEARCH_BACKEND", "fulltext")
+    assert not rollup_compatible({"search": "Sk"}, "mysql")
+    assert rollup_compatible({"search": "Sk"}, "sqlite")
+    # Terms shorter than an ngram use LIKE in the list as well
+    assert rollup_compatible({"search": "S"}, "mysql")
+    monkeypatch.setattr(search, "SEARCH_BACKEND", "like")
+    assert rollup_compatible({"search": "Sk"}, "mysql")
+
+    status = db_session.query(OrderStatus).first()
+    category = db_session.query(VehicleCategory).first()
+    for brand in ("Škoda", "Skoda Auto", "Seat"):
+        client.post("/api/orders", json={
+            "brand": brand, "price": 10.0,
+            "vehicle_category_id": category.id, "status_id": status.id})
+    listed = client.get("/api/orders?search=koda").json()
+    stats = client.get("/api/orders/stats?search=koda").json()
+    assert stats["totals"]["count"] == listed["total"]
+
+    db_session.query(Order).delete()
+    db_session.query(OrderDailyRollup).delete()
+    db_session.commit()
@@ -1,6 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.lookup_cache import LookupCache
+import uuid
 
 # Create test client
 client = TestClient(app)
@@ -13,3 +15,42 @@ def test_get_statuses_empty(client, db_session):
     assert isinstance(data, dict)
     assert len(data) > 0
     assert all(isinstance(status, str) for status in data.values())
+
+
+def test_get_statuses_conditional_request(client, db_session):
+    response = client.get("/api/statuses")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert "max-age" in response.headers["cache-control"]
+
+    response = client.get("/api/statuses", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_status_write_invalidates_cache(client, db_session):
+    etag = client.get("/api/statuses").headers["etag"]
+
+    unique_name = f"Test Status {uuid.uuid4()}"
+    response = client.post("/api/statuses", json={"status": unique_name})
+    assert response.status_code == 200
+    status_id = response.json()["id"]
+
+    response = client.get("/api/statuses", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[str(status_id)] == unique_name
+
+    client.delete(f"/api/statuses/{status_id}")
+    assert str(status_id) not in client.get("/api/statuses").json()
+
+
+def test_lookup_cache_signal_file(tmp_path):
+    signal_file = str(tmp_path / "lookup-cache.signal")
+    worker_a = LookupCache(ttl=60, signal_file=signal_file)
+    worker_b = LookupCache(ttl=60, signal_file=signal_file)
+    worker_b.set("statuses", {"1": "Nové"}, generation=0)
+    assert worker_b.get("statuses") is not None
+
+    # A write handled by another worker reaches this one through the file
+    worker_a.invalidate()
+    assert worker_b.get("statuses") is None
@@ -2,6 +2,8 @@ import axios from "axios";
 
 const api = axios.create({
     baseURL: import.meta.env.VITE_API_URL || "http://localhost:8008",
+    // Sends and stores the API's cookies, e.g. the read-your-writes one
+    withCredentials: true,
 });
 
 export default api;
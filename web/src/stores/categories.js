@@ -9,16 +9,20 @@ export const useCategoriesStore = defineStore('categories', {
   }),
 
   actions: {
+    setCategories(data) {
+      // Convert array response to object format for compatibility
+      this.categories = data.reduce((acc, cat) => {
+        acc[cat.id] = cat.name
+        return acc
+      }, {})
+      this.error = null
+    },
+
     async fetchCategories() {
       this.loading = true
       try {
         const response = await api.get('/api/vehicle-categories/')
-        // Convert array response to object format for compatibility
-        this.categories = response.data.reduce((acc, cat) => {
-          acc[cat.id] = cat.name
-          return acc
-        }, {})
-        this.error = null
+        this.setCategories(response.data)
       } catch (error) {
         this.error = error.response?.data?.detail || error.message || 'Chyba pri načítaní kategórií'
       } finally {
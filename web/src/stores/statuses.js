@@ -9,13 +9,17 @@ export const useStatusesStore = defineStore('statuses', {
   }),
 
   actions: {
+    setStatuses(data) {
+      // Response is already in the correct format {id: status}
+      this.statuses = data
+      this.error = null
+    },
+
     async fetchStatuses() {
       this.loading = true
       try {
         const response = await api.get('/api/statuses')
-        // Response is already in the correct format {id: status}
-        this.statuses = response.data
-        this.error = null
+        this.setStatuses(response.data)
       } catch (error) {
         this.error = error.response?.data?.detail || error.message || 'Chyba pri načítaní stavov'
       } finally {